@@ -0,0 +1,87 @@
+"""
+Per-lookup cost of the compiled glyph index as the number of glyph rules grows.
+
+The name rules (exact names and prefixes) are grown to thousands of entries and the lookup cost
+of the compiled index is compared with checking the rules one after the other, like the old
+`if`/`elif` chain did. Command line rules are kept at the default set, they are combined into a
+single regex whose cost grows with the number of command line rules.
+
+    python benchmarks/glyphs.py [lookups]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from tmux_styler._CLI.glyphs import GlyphIndex, glyph_rules  # noqa: E402
+
+SIZES = [0, 10, 100, 1000, 5000]
+"""
+Number of extra exact and prefix rules.
+"""
+
+PROCESSES = [
+    ("zsh", "-zsh"),
+    ("nvim", "nvim README.md"),
+    ("python3.11", "python3.11 manage.py runserver"),
+    ("gitk", "gitk --all"),
+    ("unknown-tool", "unknown-tool --flag"),
+]
+"""
+Process names and command lines looked up, a mix of exact, prefix, command line and missing matches.
+"""
+
+
+def user_glyphs(size: int) -> dict[str, str]:
+    """
+    Synthetic user glyphs, half process names and half prefixes.
+    """
+    glyphs = {}
+    for idx in range(size // 2):
+        glyphs[f"tool{idx}"] = "x"
+        glyphs[f"prefix{idx}*"] = "y"
+    return glyphs
+
+
+def linear_glyph(rules: dict, name: str) -> str | None:
+    """
+    Checks the rules one after the other, the baseline.
+    """
+    name = name.lower()
+    for exact, glyph in rules["exact"].items():
+        if name == exact:
+            return glyph
+    for prefix, glyph in rules["prefix"].items():
+        if name.startswith(prefix):
+            return glyph
+    return None
+
+
+def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'rules':>8}{'index':>12}{'linear':>12}")
+    for size in SIZES:
+        rules = glyph_rules(user_glyphs(size))
+        index = GlyphIndex(rules)
+        count = len(rules["exact"]) + len(rules["prefix"])
+
+        def lookup_index():
+            for name, command_line in PROCESSES:
+                index.glyph(name, lambda: command_line)
+
+        def lookup_linear():
+            for name, _ in PROCESSES:
+                linear_glyph(rules, name)
+
+        runs = max(1, lookups // len(PROCESSES))
+        index_ns = timeit.timeit(lookup_index, number=runs) / \
+            (runs * len(PROCESSES)) * 1e9
+        linear_ns = timeit.timeit(lookup_linear, number=runs) / \
+            (runs * len(PROCESSES)) * 1e9
+        print(f"{count:>8}{index_ns:>9.0f} ns{linear_ns:>9.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Render latency of a redraw against a stand-in tmux and a synthetic process tree.
+
+The statusbar sides, the window list and the current command of a pane are rendered in-process,
+the way the render server does, for a growing number of segments, windows and processes. tmux is
+replaced by a stub on $PATH answering `display-message` and `show` from a fixture, and the process
+table by a synthetic /proc. Reports the p50/p99 latency and the peak memory allocated per redraw.
+
+With --save the results are written to benchmarks/results/render.json, commit it along with a change
+so regressions show up in the diff.
+
+    python benchmarks/render.py [runs] [--save]
+"""
+import os
+import sys
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+RESULTS = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "results", "render.json")
+
+SEGMENTS = [1, 10, 50]
+"""
+Number of function segments on the right side.
+"""
+
+WINDOWS = [1, 20, 200]
+"""
+Number of windows, tmux renders the window format once per window.
+"""
+
+PROCESSES = [1, 500, 5000]
+"""
+Number of processes in the synthetic process table.
+"""
+
+SEGMENT_CYCLE = ["cwd", "session_name", "date", "window_info"]
+"""
+Segments the sides are filled with, one resolving a context variable, two tmux formats and one python only.
+"""
+
+FIXTURE = {
+    "formats": {
+        "pane_current_path": "/home/user/projects/tmux-styler/src/tmux_styler/Statusbar",
+        "session_name": "bench",
+        "window_index": "1",
+        "window_name": "nvim",
+        "window_flags": "*",
+        "active_window_index": "1",
+    },
+    "options": {
+        "status-interval": "1",
+        "@TMUX_STYLER_DIR": "/tmp/tmux-styler",
+    },
+}
+"""
+Values the stand-in tmux answers with, formats it doesn't know expand to nothing.
+"""
+
+FAKE_TMUX = """#!{python} -SI
+import os, re, sys, json
+
+with open(os.environ["TMUX_STYLER_BENCH_FIXTURE"]) as f:
+    fixture = json.load(f)
+
+commands = [[]]
+for arg in sys.argv[1:]:
+    if arg == ";":
+        commands.append([])
+    else:
+        commands[-1].append(arg)
+
+for command in commands:
+    if not command:
+        continue
+    if command[0] in ("display-message", "display"):
+        print(re.sub(r"#\\{{([^}}]*)\\}}",
+                     lambda match: fixture["formats"].get(match[1], ""), command[-1]))
+    elif command[0] in ("show", "show-options") and command[-1] in fixture["options"]:
+        print(fixture["options"][command[-1]])
+"""
+"""
+Stand-in tmux, answers `display-message -p` and `show` and ignores every other command.
+"""
+
+
+def install_fake_tmux(directory: str):
+    """
+    Writes the stand-in tmux and puts it first on $PATH.
+    """
+    path = os.path.join(directory, "tmux")
+    with open(path, "w") as f:
+        f.write(FAKE_TMUX.format(python=sys.executable))
+    os.chmod(path, 0o755)
+    fixture = os.path.join(directory, "fixture.json")
+    with open(fixture, "w") as f:
+        json.dump(FIXTURE, f)
+    os.environ["PATH"] = directory + os.pathsep + os.environ["PATH"]
+    os.environ["TMUX_STYLER_BENCH_FIXTURE"] = fixture
+
+
+def write_process_tree(root: str, processes: int, tpgid: bool, panes: int | None = None) -> list[int]:
+    """
+    Writes a synthetic /proc of the given number of processes and returns the pids of the panes.
+    A pane is a zsh running nvim, by default one pane per 100 processes, the other processes are idle.
+    Without tpgid the terminal's foreground process group is left out, so the process tree is walked.
+    """
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+
+    def process(pid: int, ppid: int, name: str, cmdline: list[str], foreground: int):
+        os.makedirs(os.path.join(root, str(pid)))
+        # state ppid pgrp session tty_nr tpgid, then 13 fields up to starttime
+        stat = f"{pid} ({name}) S {ppid} {pid} {pid} 34816 {foreground if tpgid else 0} " + \
+            " ".join(["0"] * 13) + f" {1000 + pid} 0 0\n"
+        for file, content in (("stat", stat), ("comm", name + "\n"), ("cmdline", "\0".join(cmdline) + "\0")):
+            with open(os.path.join(root, str(pid), file), "w") as f:
+                f.write(content)
+
+    pane_pids = []
+    pid = 100
+    remaining = processes
+    for _ in range(panes if panes is not None else max(1, processes // 100)):
+        if remaining >= 2:
+            process(pid, 1, "zsh", ["-zsh"], pid + 1)
+            process(pid + 1, pid, "nvim", ["nvim", "README.md"], pid + 1)
+            remaining -= 2
+        else:
+            process(pid, 1, "zsh", ["-zsh"], pid)
+            remaining -= 1
+        pane_pids.append(pid)
+        pid += 2
+    for _ in range(remaining):
+        process(pid, 1, "sleep", ["sleep", "infinity"], 0)
+        pid += 1
+    return pane_pids
+
+
+def build_plan(segments: int):
+    """
+    Writes the render plan of a statusbar with the given number of segments on the right side.
+    """
+    from tmux_styler import Segment, SegmentType, Statusbar, WindowList
+    from tmux_styler._CLI.plan import build_plan, write_plan
+    from tmux_styler._CLI.glyphs import glyph_rules
+
+    window_list = WindowList(Segment(SegmentType.FUNCTION, "window_info"),
+                             Segment(SegmentType.FUNCTION, "window_info"))
+    statusbar = Statusbar(
+        [Segment(SegmentType.FUNCTION, "session_name")],
+        [Segment(SegmentType.FUNCTION, SEGMENT_CYCLE[idx % len(SEGMENT_CYCLE)])
+         for idx in range(segments)],
+        window_list)
+    write_plan(build_plan(statusbar, {
+        "glyph_rules": glyph_rules(None),
+        "glyph": True,
+        "max_depth": 1,
+        "subscribe_context": False,
+    }))
+
+
+def measure(redraw, runs: int) -> dict:
+    """
+    Returns the p50/p99 latency of a redraw in milliseconds and the peak memory it allocates in KiB.
+    """
+    for _ in range(3):
+        redraw()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        redraw()
+        times.append((time.perf_counter() - start) * 1000)
+
+    # Traced separately, tracing slows down every allocation
+    peak = 0
+    tracemalloc.start()
+    for _ in range(3):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        redraw()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(statistics.median(times), 2),
+        "p99_ms": round(statistics.quantiles(times, n=100)[98], 2),
+        "alloc_kib": round(peak / 1024, 1),
+    }
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "--save"]
+    runs = int(args[0]) if args else 100
+
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        "XDG_CACHE_HOME": os.path.join(directory, "cache"),
+        "XDG_RUNTIME_DIR": os.path.join(directory, "runtime"),
+        "TMUX": "/tmp/tmux-styler-bench,0,0",
+        "TMUX_PANE": "%0",
+    })
+    install_fake_tmux(directory)
+    build_plan(1)
+
+    from tmux_styler._CLI import process_name, process_segments
+
+    results = {}
+
+    def report(name: str, result: dict):
+        results[name] = result
+        print(f"{name:<36}{result['p50_ms']:>9.2f} ms{result['p99_ms']:>9.2f} ms"
+              f"{result['alloc_kib']:>10.1f} KiB")
+
+    print(f"{'':<36}{'p50':>12}{'p99':>12}{'alloc':>14}")
+
+    # Spawn cost of the stand-in, included once in every redraw that resolves context variables
+    report("fake tmux", measure(lambda: subprocess.run(
+        ["tmux", "display-message", "-p", "#{session_name}"], stdout=subprocess.DEVNULL), runs))
+
+    for segments in SEGMENTS:
+        build_plan(segments)
+        process_segments.reload_plan()
+        report(f"sides segments={segments}", measure(lambda: (
+            process_segments.process_left_right_segments(True, True),
+            process_segments.process_left_right_segments(False, True)), runs))
+
+    for windows in WINDOWS:
+        def redraw():
+            process_segments.process_window_segments("active")
+            for _ in range(windows - 1):
+                process_segments.process_window_segments("inactive")
+        report(f"windows windows={windows}", measure(redraw, runs))
+
+    process_name.PROC = os.path.join(directory, "proc")
+    for tpgid in (True, False):
+        for processes in PROCESSES:
+            panes = write_process_tree(process_name.PROC, processes, tpgid)
+            calls = iter(range(sys.maxsize))
+            report(f"process_name {'tpgid' if tpgid else 'walk'} processes={processes}",
+                   measure(lambda: process_name.process_name(panes[next(calls) % len(panes)]), runs))
+
+    shutil.rmtree(directory, ignore_errors=True)
+    if "--save" in sys.argv[1:]:
+        os.makedirs(os.path.dirname(RESULTS), exist_ok=True)
+        with open(RESULTS, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Aggregate cost of a large tmux server: hundreds of sessions, each with many windows and panes, and
+several attached clients, redrawn every status-interval.
+
+The config, default.py unless --config is given, is styled against the stand-in tmux of
+benchmarks/render.py and the jobs are taken from the options it sets: the `#(tmux-styler ...)`
+calls left in the formats once the statusbar is compiled. Every interval tmux runs one job per call:
+- every client expands `status-left` and `status-right`, the window formats once per window of its
+  session and `pane-border-format` once per pane of its current window
+- every window of every session expands `automatic-rename-format` for its active pane
+
+The jobs of an interval are rendered in-process, the way the render server does, against the
+stand-in tmux and a synthetic /proc. Every job is also a `sh -c` and a `tmux-styler` client
+spawned by tmux, their cost is measured once against a stand-in render server and added per job.
+Reports the aggregate CPU time per second (in cores), process spawns per second and memory of the
+render server and the clients, for a growing number of sessions and clients.
+
+    python benchmarks/scale.py [intervals] [--interval SECONDS] [--config PATH]
+"""
+import os
+import re
+import sys
+import runpy
+import shlex
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS)
+
+from render import install_fake_tmux, write_process_tree  # noqa: E402
+from startup import SRC, fake_render_server  # noqa: E402
+
+from tmux_styler._CLI.main import RENDER_FLAGS  # noqa: E402
+
+DEFAULT_CONFIG = os.path.join(BENCHMARKS, "..", "default.py")
+
+TOPOLOGIES = [
+    (1, 10, 3, 1),
+    (10, 15, 3, 1),
+    (50, 15, 3, 1),
+    (100, 15, 3, 1),
+    (100, 15, 3, 10),
+    (100, 15, 3, 50),
+    (100, 20, 5, 10),
+]
+"""
+Sessions, windows per session, panes per window and attached clients.
+"""
+
+CLIENT_RUNS = 20
+"""
+Number of clients spawned to measure the cost of a single one.
+"""
+
+CLIENT_WIDTH = 200
+"""
+Width of the clients, passed to the sides that drop segments to fit.
+"""
+
+SPAWNS = {"subprocess.Popen", "os.system"}
+"""
+Audit events of a process spawned by a render.
+"""
+
+JOB = re.compile(r"#\(([^)]*)\)")
+"""
+A job in a tmux format, `#(command)`.
+"""
+
+
+def compiled_options(config_path: str) -> dict[str, str]:
+    """
+    Styles tmux with the config and returns the global options it sets, read back from the
+    compiled theme. Also writes the render plan the jobs are rendered with.
+    """
+    from tmux_styler._CLI.theme import theme_path
+
+    runpy.run_path(config_path, run_name="__main__")
+    options = {}
+    with open(theme_path(), "r", encoding="utf-8") as f:
+        for line in f:
+            command = shlex.split(line, comments=True)
+            if len(command) == 4 and command[:2] == ["set", "-g"]:
+                options[command[2]] = command[3]
+    return options
+
+
+def format_jobs(format: str, values: dict[str, str]) -> list[list[str]]:
+    """
+    Returns the render requests of the `#(tmux-styler ...)` calls of a format, with the formats in
+    their commands expanded from values.
+    """
+    jobs = []
+    for command in JOB.findall(format):
+        command = re.sub(r"#\{(\w+)\}", lambda match: values.get(match[1], ""), command)
+        argv = shlex.split(command)
+        if len(argv) < 3 or argv[0] != "tmux-styler" or argv[1] not in RENDER_FLAGS:
+            continue
+        # `-sl 1 -w 200` is requested as ["sl", "1", "200"]
+        jobs.append([RENDER_FLAGS[argv[1]], argv[2], *argv[4:5]])
+    return jobs
+
+
+def interval_jobs(options: dict[str, str], sessions: int, windows: int, panes: int, clients: int,
+                  pane_pids: list[int]) -> list[list[str]]:
+    """
+    Returns the render requests tmux makes in one status-interval. Clients are attached to the
+    sessions round robin and show the first window of their session.
+    """
+    def values(session: int, window: int, pane: int) -> dict[str, str]:
+        return {
+            "session_id": f"${session}",
+            "window_start_flag": "1" if window == 0 else "0",
+            "window_end_flag": "1" if window == windows - 1 else "0",
+            "pane_pid": str(pane_pids[(session * windows + window) * panes + pane]),
+            "client_width": str(CLIENT_WIDTH),
+        }
+
+    jobs = []
+    if options.get("automatic-rename") == "on":
+        for session in range(sessions):
+            for window in range(windows):
+                jobs += format_jobs(options.get("automatic-rename-format", ""),
+                                    values(session, window, 0))
+    for client in range(clients):
+        session = client % sessions
+        jobs += format_jobs(options.get("status-left", ""), values(session, 0, 0))
+        jobs += format_jobs(options.get("status-right", ""), values(session, 0, 0))
+        jobs += format_jobs(options.get("window-status-current-format", ""), values(session, 0, 0))
+        for window in range(1, windows):
+            jobs += format_jobs(options.get("window-status-format", ""), values(session, window, 0))
+        if options.get("pane-border-status", "off") != "off":
+            for pane in range(panes):
+                jobs += format_jobs(options.get("pane-border-format", ""), values(session, 0, pane))
+    return jobs
+
+
+def client_cost(runtime_dir: str) -> tuple[float, float]:
+    """
+    Returns the CPU time in seconds and the peak memory in MiB of a `sh -c 'tmux-styler -sw active'`,
+    the way tmux runs a job, against a stand-in render server.
+    """
+    os.makedirs(os.path.join(runtime_dir, "tmux-styler"), exist_ok=True)
+    fake_render_server(os.path.join(runtime_dir, "tmux-styler", "tmp-tmux-styler-bench.sock"))
+    env = {**os.environ, "PYTHONPATH": SRC, "TMUX_STYLER_RENDER_SERVER": "1"}
+    code = "import sys; sys.argv = ['tmux-styler', '-sw', 'active']; " \
+        "from tmux_styler._CLI.main import main; main()"
+    command = f"{sys.executable} -c \"{code}\""
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    for _ in range(CLIENT_RUNS):
+        subprocess.run(["sh", "-c", command], env=env, stdout=subprocess.DEVNULL, check=True)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return cpu / CLIENT_RUNS, after.ru_maxrss / 1024
+
+
+def main():
+    args = sys.argv[1:]
+    interval = 1.0
+    if "--interval" in args:
+        idx = args.index("--interval")
+        interval = float(args[idx + 1])
+        del args[idx:idx + 2]
+    config_path = DEFAULT_CONFIG
+    if "--config" in args:
+        idx = args.index("--config")
+        config_path = args[idx + 1]
+        del args[idx:idx + 2]
+    intervals = int(args[0]) if args else 3
+
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        "XDG_CACHE_HOME": os.path.join(directory, "cache"),
+        "XDG_RUNTIME_DIR": os.path.join(directory, "runtime"),
+        "TMUX": "/tmp/tmux-styler-bench,0,0",
+        "TMUX_PANE": "%0",
+    })
+    install_fake_tmux(directory)
+    options = compiled_options(config_path)
+
+    import psutil
+    from tmux_styler._CLI import process_name
+    from tmux_styler._CLI.render import render
+
+    spawns = 0
+
+    def audit(event: str, _):
+        nonlocal spawns
+        if event in SPAWNS:
+            spawns += 1
+    sys.addaudithook(audit)
+
+    client_cpu, client_rss = client_cost(os.environ["XDG_RUNTIME_DIR"])
+    print(f"client: {client_cpu * 1000:.1f} ms CPU, {client_rss:.1f} MiB per job, "
+          f"status-interval {interval:g} s\n")
+    print(f"{'sessions':>8}{'windows':>8}{'panes':>7}{'clients':>8}{'jobs/s':>9}{'spawns/s':>10}"
+          f"{'server':>9}{'tmux':>8}{'clients':>9}{'total':>8}{'server RSS':>12}")
+
+    process_name.PROC = os.path.join(directory, "proc")
+    server = psutil.Process()
+    for sessions, windows, panes, clients in TOPOLOGIES:
+        pane_pids = write_process_tree(process_name.PROC, 2 * sessions * windows * panes, True,
+                                       sessions * windows * panes)
+        jobs = interval_jobs(options, sessions, windows, panes, clients, pane_pids)
+
+        # The first interval warms the caches, the steady state is what runs every interval
+        for job in jobs:
+            render(job)
+        spawns = 0
+        server_before = time.process_time()
+        tmux_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        for _ in range(intervals):
+            for job in jobs:
+                render(job)
+        tmux_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        # Per second of status-interval, in CPU cores
+        per_second = intervals * interval
+        server_cpu = (time.process_time() - server_before) / per_second
+        tmux_cpu = ((tmux_after.ru_utime - tmux_before.ru_utime) +
+                    (tmux_after.ru_stime - tmux_before.ru_stime)) / per_second
+        jobs_per_second = len(jobs) / interval
+        clients_cpu = jobs_per_second * client_cpu
+        # A shell and a client per job, plus what the renders spawn
+        spawns_per_second = 2 * jobs_per_second + spawns / per_second
+        total = server_cpu + tmux_cpu + clients_cpu
+        print(f"{sessions:>8}{windows:>8}{panes:>7}{clients:>8}{jobs_per_second:>9.0f}"
+              f"{spawns_per_second:>10.0f}{server_cpu:>9.3f}{tmux_cpu:>8.3f}{clients_cpu:>9.2f}"
+              f"{total:>8.2f}{server.memory_info().rss / 2 ** 20:>8.1f} MiB")
+
+    print("\nCPU columns are in cores, the CPU time spent per second of wall time. "
+          "tmux is the stand-in answering context variables.")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Startup time budget for the CLI modes tmux runs on every redraw.
+
+Each mode is run in a fresh interpreter against a stand-in render server and its
+median wall time, minus that of a bare interpreter, is checked against its budget.
+Exits with a non-zero status when a mode is over budget.
+
+    python benchmarks/startup.py [runs]
+"""
+import os
+import sys
+import json
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+STARTUP_BUDGETS_MS = {
+    "--config-path": 50,
+    "-sl 1": 70,
+    "-sr 0": 70,
+    "-sw active": 70,
+    "-ppid 1": 70,
+}
+"""
+Budget in milliseconds for each mode, on top of the interpreter's own startup time.
+"""
+
+
+def fake_render_server(path: str):
+    """
+    Answers every render request with an empty output, so only the client side is measured.
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(16)
+
+    def serve():
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                conn.makefile("rb").readline()
+                conn.sendall(json.dumps({"ok": True, "output": ""}).encode())
+
+    threading.Thread(target=serve, daemon=True).start()
+
+
+def median_ms(argv: list[str], env: dict, runs: int) -> float:
+    """
+    Median wall time of running argv, in milliseconds.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def mode_code(mode: str) -> str:
+    """
+    Code that runs the CLI with the arguments of a mode.
+    """
+    return f"import sys; sys.argv = ['tmux-styler', *{mode.split()!r}]; " \
+        "from tmux_styler._CLI.main import main; main()"
+
+
+def startup_costs(runs: int) -> tuple[float, dict[str, float]]:
+    """
+    Returns the median startup time of a bare interpreter and that of each mode on top of it,
+    in milliseconds.
+    """
+    runtime_dir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "PYTHONPATH": SRC,
+        "XDG_RUNTIME_DIR": runtime_dir,
+        "TMUX": "/tmp/tmux-styler-bench,0,0",
+        "TMUX_STYLER_RENDER_SERVER": "1",
+    }
+    os.makedirs(os.path.join(runtime_dir, "tmux-styler"))
+    fake_render_server(os.path.join(
+        runtime_dir, "tmux-styler", "tmp-tmux-styler-bench.sock"))
+
+    baseline = median_ms([sys.executable, "-c", "pass"], env, runs)
+    costs = {mode: median_ms([sys.executable, "-c", mode_code(mode)], env, runs) - baseline
+             for mode in STARTUP_BUDGETS_MS}
+    return baseline, costs
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    baseline, costs = startup_costs(runs)
+    print(f"{'interpreter':<16}{baseline:8.1f} ms")
+
+    over_budget = False
+    for mode, budget in STARTUP_BUDGETS_MS.items():
+        cost = costs[mode]
+        status = "ok" if cost <= budget else "OVER BUDGET"
+        over_budget |= cost > budget
+        print(f"{mode:<16}{cost:8.1f} ms  (budget {budget} ms)  {status}")
+
+    sys.exit(1 if over_budget else 0)
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 tmux context variables.
 """
 from enum import Enum
-import subprocess
 from typing import List
 
 
@@ -970,20 +969,95 @@ class ContextVar(Enum):
 
     def current_value(self) -> str:
         """
-        Returns the current value of the context variable.
+        Returns the current value of the context variable wrapped in single quotes, e.g. `'main'`.
+        Kept for existing segments that strip the quotes, see `current_raw_value` for the value itself.
         """
-        # run shell command to get current value
-        return subprocess.run(["tmux", "display-message", "-p", f"'{str(self)}'"], stdout=subprocess.PIPE).stdout.decode("utf-8").strip()
+        return f"'{_display([str(self)])[0]}'"
+
+    def current_raw_value(self) -> str:
+        """
+        Returns the current value of the context variable, as is.
+        """
+        return _display([str(self)])[0]
 
 
 def current_values(vars: List[ContextVar]) -> List[str]:
     """
     Returns the current values of the context variables as a list.
-    More efficient than calling current_value on each variable.
+    More efficient than calling current_raw_value on each variable.
     """
-    # call string on each variable
-    command = ["tmux", "display-message", "-p",
-               "\n".join([str(var) for var in vars])]
+    return _display([str(var) for var in vars])
+
+
+_control_client = None
+"""
+Control mode connection used for lookups instead of a tmux process per call, see `use_control_mode`.
+"""
+
+
+def use_control_mode(subscribe: List[ContextVar] | None = None) -> bool:
+    """
+    Routes the lookups of this process over a single tmux control mode connection, used by the
+    render server. Returns False, and lookups keep starting a tmux process, if tmux doesn't
+    support it (before 3.2).
+
+    Parameters:
+    -----------
+    `subscribe` (List[ContextVar] | None):
+        Context variables tmux should push the values of when they change, instead of being asked
+        for them on every lookup. tmux checks for changes once a second, so a pushed value can be
+        up to a second old.
+    """
+    global _control_client
+    from .ControlMode import ControlClient, ControlModeError
+
+    if _control_client is None or not _control_client.alive:
+        try:
+            _control_client = ControlClient()
+        except (OSError, ControlModeError):
+            _control_client = None
+            return False
+    try:
+        for var in subscribe or []:
+            _control_client.subscribe(str(var))
+    except ControlModeError:
+        pass
+    return True
+
+
+def close_control_mode():
+    """
+    Detaches the control mode connection, lookups start a tmux process again.
+    """
+    global _control_client
+    if _control_client is not None:
+        _control_client.close()
+        _control_client = None
+
+
+def _display(formats: List[str]) -> List[str]:
+    """
+    Expands the formats for the current pane, over the control mode connection if there is one.
+    """
+    import os
+    pane = os.environ.get("TMUX_PANE")
+    client = _control_client
+    # Without a pane to target, the control client would answer for the session it is attached to
+    if pane is not None and client is not None and client.alive:
+        from .ControlMode import ControlModeError
+        values = [client.subscribed(format, pane) for format in formats]
+        if None not in values:
+            return values
+        try:
+            return client.display(formats, pane)
+        except ControlModeError:
+            pass
+
+    import subprocess
+    command = ["tmux", "display-message", "-p"]
+    if pane is not None:
+        command += ["-t", pane]
+    command.append("\n".join(formats))
     proc = subprocess.run(command, stdout=subprocess.PIPE)
-    # split the output and ruturn
-    return proc.stdout.decode("utf-8").strip().split("\n")
+    # split the output and return, only the trailing newline is removed so empty values keep their place
+    return proc.stdout.decode("utf-8").removesuffix("\n").split("\n")
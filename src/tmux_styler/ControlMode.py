@@ -0,0 +1,208 @@
+"""
+tmux control mode connection.
+
+A `ControlClient` keeps a single `tmux -C` client attached to the tmux server and sends
+commands over it, instead of starting a new tmux client process for every command.
+Many requests can be written before their responses are read, tmux answers them in order.
+
+Format subscriptions (`refresh-client -B`, tmux 3.2+) let tmux push the value of a format
+for every pane whenever it changes, so those values don't have to be asked for at all.
+"""
+import os
+import threading
+import subprocess
+from collections import deque
+
+RESPONSE_TIMEOUT = 1
+"""
+Seconds to wait for the response to a command before the connection is considered broken.
+"""
+
+
+class ControlModeError(Exception):
+    """
+    A command failed, or the control mode connection is not available.
+    """
+
+
+def quote(argument: str) -> str:
+    """
+    Quotes an argument for the tmux command parser.
+    """
+    return "'" + argument.replace("'", "'\\''") + "'"
+
+
+class ControlClient:
+    """
+    Connection to a tmux server in control mode.
+
+    Parameters:
+    -----------
+    `command` (list[str] | None):
+        Command starting the control mode client. Defaults to attaching a `tmux -C` client to the
+        tmux server of `$TMUX`, which doesn't affect the window sizes and gets no pane output.
+        Anything speaking the control mode protocol on stdin/stdout can be used instead.
+
+    Methods:
+    --------
+    command(command: str) -> list[str]
+        Runs a tmux command and returns its output lines.
+
+    display(formats: list[str], target: str | None = None) -> list[str]
+        Expands formats with `display-message -p`, pipelining one command per format.
+
+    subscribe(format: str) -> str
+        Subscribes to the value of a format for every pane of the attached session.
+
+    subscribed(format: str, pane: str) -> str | None
+        Returns the last pushed value of a subscribed format for a pane.
+
+    close()
+        Detaches the client.
+    """
+
+    def __init__(self, command: list[str] | None = None):
+        env = dict(os.environ)
+        if command is None:
+            command = ["tmux"]
+            tmux = env.pop("TMUX", None)
+            if tmux:
+                command += ["-S", tmux.split(",")[0]]
+            command += ["-C", "attach-session", "-f", "ignore-size,no-output"]
+
+        self.__lock = threading.Lock()
+        self.__pending: deque[dict] = deque()
+        self.__subscriptions: dict[str, str] = {}
+        self.__values: dict[tuple[str, str], str] = {}
+        self.alive = True
+
+        self.__process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, env=env, start_new_session=True)
+        # The attach command is answered like any other command
+        attach = self.__expect()
+        threading.Thread(target=self.__read, daemon=True).start()
+        self.__wait(attach)
+
+    def __expect(self) -> dict:
+        """
+        Queues a response slot, responses arrive in the order the commands were sent.
+        """
+        response = {"event": threading.Event(), "lines": [],
+                    "done": False, "error": False}
+        self.__pending.append(response)
+        return response
+
+    def __read(self):
+        """
+        Reader thread, routes command output to the pending responses and handles notifications.
+        """
+        response = None
+        try:
+            for line in self.__process.stdout:
+                line = line.decode("utf-8", "replace").removesuffix("\n")
+                if response is not None:
+                    if line.startswith(("%end ", "%error ")):
+                        response["done"] = True
+                        response["error"] = line.startswith("%error")
+                        response["event"].set()
+                        response = None
+                    else:
+                        response["lines"].append(line)
+                elif line.startswith("%begin "):
+                    response = self.__pending.popleft()
+                elif line.startswith("%subscription-changed "):
+                    self.__subscription_changed(line)
+                elif line.startswith("%exit"):
+                    break
+        finally:
+            self.alive = False
+            # Wake up everyone still waiting for a response
+            while self.__pending:
+                self.__pending.popleft()["event"].set()
+            if response is not None:
+                response["event"].set()
+
+    def __subscription_changed(self, line: str):
+        """
+        Stores the value of `%subscription-changed name $session @window index %pane ... : value`.
+        """
+        header, _, value = line.partition(" : ")
+        fields = header.split(" ")
+        if len(fields) < 6 or fields[1] not in self.__subscriptions:
+            return
+        self.__values[(self.__subscriptions[fields[1]], fields[5])] = value
+
+    def __wait(self, response: dict) -> list[str]:
+        if not response["event"].wait(RESPONSE_TIMEOUT) or not response["done"]:
+            self.close()
+            raise ControlModeError("The control mode connection is not available")
+        if response["error"]:
+            raise ControlModeError("\n".join(response["lines"]))
+        return response["lines"]
+
+    def __send(self, commands: list[str]) -> list[dict]:
+        """
+        Writes the commands at once and returns their response slots.
+        """
+        if not self.alive:
+            raise ControlModeError("The control mode connection is not available")
+        with self.__lock:
+            responses = [self.__expect() for _ in commands]
+            try:
+                self.__process.stdin.write(
+                    "".join(command + "\n" for command in commands).encode("utf-8"))
+                self.__process.stdin.flush()
+            except OSError:
+                self.close()
+                raise ControlModeError(
+                    "The control mode connection is not available")
+        return responses
+
+    def command(self, command: str) -> list[str]:
+        """
+        Runs a tmux command and returns its output lines.
+        """
+        return self.__wait(self.__send([command])[0])
+
+    def display(self, formats: list[str], target: str | None = None) -> list[str]:
+        """
+        Expands formats with `display-message -p` for the target, e.g. a pane id.
+        """
+        prefix = "display-message -p "
+        if target is not None:
+            prefix += f"-t {quote(target)} "
+        responses = self.__send([prefix + quote(format) for format in formats])
+        return ["\n".join(self.__wait(response)) for response in responses]
+
+    def subscribe(self, format: str) -> str:
+        """
+        Subscribes to the value of a format for every pane of the attached session and returns
+        the subscription name. tmux pushes a value when it changes, checked at most once a second.
+        """
+        for name, subscribed in self.__subscriptions.items():
+            if subscribed == format:
+                return name
+        name = f"tmux-styler-{len(self.__subscriptions)}"
+        self.__subscriptions[name] = format
+        self.command(f"refresh-client -B {quote(f'{name}:%*:{format}')}")
+        return name
+
+    def subscribed(self, format: str, pane: str) -> str | None:
+        """
+        Returns the last pushed value of a subscribed format for a pane, or None.
+        """
+        return self.__values.get((format, pane))
+
+    def close(self):
+        """
+        Detaches the client.
+        """
+        self.alive = False
+        try:
+            self.__process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.__process.wait(RESPONSE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.__process.kill()
@@ -0,0 +1,262 @@
+"""
+Compiles the statusbar into static tmux formats at `Styler.style()` time.
+
+Segments whose output is a plain tmux format (string segments and segments decorated with
+`tmux_format`) are inlined. A side is compiled if all of its segments are inlined, otherwise the
+side is rendered by a single `#(tmux-styler ...)` job, given the client's width if it drops segments
+to fit. tmux expands the variables in the output of a job but not strftime directives, so the
+job's template still inlines the segments whose format has none and only runs the others.
+"""
+import re
+import math
+import importlib
+
+from .Segment import Segment, SegmentType
+from .Segments import DEFAULT_SEGMENTS, REFRESH_EVENTS
+from .Render import fit_format, seg_if, side_format, side_layout, style_content, window_format
+
+STRFTIME_INTERVALS = {
+    **dict.fromkeys("SsTXcr+", 1),
+    **dict.fromkeys("MR", 60),
+    **dict.fromkeys("HIklpP", 3600),
+}
+"""
+Seconds between changes of the strftime directives that change more than once a day.
+"""
+
+
+def segment_id(statusbar, segment: Segment) -> str:
+    """
+    Returns the id used to refer to a segment from the CLI, "l{index}" or "r{index}" for the
+    left and right side and "wa" or "wi" for the active and inactive window.
+    """
+    if segment is statusbar.window_list.active:
+        return "wa"
+    if segment is statusbar.window_list.inactive:
+        return "wi"
+    for prefix, side in (("l", statusbar.left_side), ("r", statusbar.right_side)):
+        segments = side[0] if isinstance(side, tuple) else side
+        for idx, other in enumerate(segments):
+            if other is segment:
+                return f"{prefix}{idx}"
+    raise ValueError("Segment is not part of the statusbar")
+
+
+def segment_function(segment: Segment):
+    """
+    Returns the function of a function segment and its name, or None if it can't be imported.
+    """
+    try:
+        if "." in segment.content:
+            module, func = segment.content.split(".")
+            module = importlib.import_module(module)
+        else:
+            module = importlib.import_module(
+                f"tmux_styler.Statusbar.Segments.{DEFAULT_SEGMENTS[segment.content]}")
+            func = segment.content
+        return getattr(module, func), func
+    except Exception:
+        return None
+
+
+def statusbar_segments(statusbar) -> list[Segment]:
+    """
+    Returns every segment of the statusbar, the sides followed by the active and inactive window.
+    """
+    segments = []
+    for side in (statusbar.left_side, statusbar.right_side):
+        segments.extend(side[0] if isinstance(side, tuple) else side)
+    segments.append(statusbar.window_list.active)
+    segments.append(statusbar.window_list.inactive)
+    return segments
+
+
+def truncates_side(statusbar, left_side: bool) -> bool:
+    """
+    Whether segments of the side are dropped to fit the client, when one of its segments has a priority.
+    """
+    segments = statusbar.left_side if left_side else statusbar.right_side
+    if isinstance(segments, tuple):
+        segments = segments[0]
+    return any(segment.priority is not None for segment in segments)
+
+
+def __inlinable(statusbar, segment: Segment) -> bool:
+    """
+    Whether the output of the segment can be expressed as a tmux format.
+    """
+    if segment.type == SegmentType.STRING:
+        return True
+    if not statusbar.compile_formats:
+        return False
+    function = segment_function(segment)
+    return function is not None and hasattr(function[0], "tmux_format")
+
+
+def __format(statusbar, segment: Segment) -> str | None:
+    """
+    Returns the tmux format of a segment decorated with `tmux_format`, styled, or None.
+    """
+    function = segment_function(segment)
+    if function is None or not hasattr(function[0], "tmux_format"):
+        return None
+    function, func = function
+
+    args = {}
+    if statusbar.segment_data is not None and func in statusbar.segment_data:
+        args = statusbar.segment_data[func] or {}
+
+    try:
+        content = function.tmux_format(**args)
+    except Exception as e:
+        return style_content(segment, str(e))
+    if isinstance(content, list):
+        content = "".join(map(str, content))
+    else:
+        content = str(content)
+    return style_content(segment, content)
+
+
+def compiles_side(statusbar, left_side: bool) -> bool:
+    """
+    Whether the side is compiled into a tmux format, when all of its segments are inlined.
+    Otherwise the side is rendered by a single job, see `job_content`.
+    """
+    if not statusbar.compile_formats:
+        return False
+    segments = statusbar.left_side if left_side else statusbar.right_side
+    if isinstance(segments, tuple):
+        segments = segments[0]
+    return all(__inlinable(statusbar, segment) for segment in segments)
+
+
+def job_content(statusbar, segment: Segment) -> str | None:
+    """
+    Returns the content of a segment as a tmux format to be output by a render job, or None if the
+    segment is rendered by python. String segments and, when compiling, segments with a tmux format
+    without strftime directives, as tmux doesn't pass the output of jobs through strftime.
+    """
+    if segment.type == SegmentType.STRING:
+        return " " + segment.content + " "
+    if not statusbar.compile_formats:
+        return None
+    format = __format(statusbar, segment)
+    if format is None or "%" in format:
+        return None
+    return format
+
+
+def is_inlined(statusbar, segment: Segment) -> bool:
+    """
+    Whether tmux renders the segment from a tmux format, without running python. Segments of sides
+    rendered by a job are inlined in its output, see `job_content`.
+    """
+    if segment.type == SegmentType.STRING:
+        return True
+    for left_side, side in ((True, statusbar.left_side), (False, statusbar.right_side)):
+        segments = side[0] if isinstance(side, tuple) else side
+        if any(other is segment for other in segments) and not compiles_side(statusbar, left_side):
+            return job_content(statusbar, segment) is not None
+    return __inlinable(statusbar, segment)
+
+
+def segment_refresh(segment: Segment) -> tuple[list[str], float | None]:
+    """
+    Returns the tmux hooks after which the content of a function segment changes and the interval
+    in seconds it changes on its own, from the segment or what its function declares with `refresh`.
+    """
+    function = segment_function(segment)
+    function = function[0] if function is not None else None
+    events = segment.events
+    if events is None:
+        events = getattr(function, "refresh_events", REFRESH_EVENTS)
+    interval = segment.ttl
+    if interval is None:
+        interval = getattr(function, "refresh_interval", None)
+    return events, interval
+
+
+def refresh_events(statusbar) -> list[str]:
+    """
+    Returns the tmux hooks that have to refresh the statusbar in `RefreshMode.EVENTS`, the events of
+    the segments rendered by python. tmux already redraws inlined segments after these events.
+    """
+    events = set()
+    for segment in statusbar_segments(statusbar):
+        if not is_inlined(statusbar, segment):
+            events.update(segment_refresh(segment)[0])
+    return [event for event in REFRESH_EVENTS if event in events]
+
+
+def strftime_interval(format: str) -> int | None:
+    """
+    Returns the seconds between changes of the strftime directives of a format, the finest of them,
+    or None if it has none or they only change once a day or less often.
+    """
+    intervals = [STRFTIME_INTERVALS[directive] for directive in re.findall(r"%(.)", format)
+                 if directive in STRFTIME_INTERVALS]
+    return min(intervals) if intervals else None
+
+
+def refresh_interval(statusbar) -> int:
+    """
+    Returns the status-interval for `RefreshMode.EVENTS`, the shortest interval of the function
+    segments rendered by python and of the strftime formats of the inlined segments, or 0 for no
+    periodic redraw at all.
+    """
+    intervals = []
+    for segment in statusbar_segments(statusbar):
+        if is_inlined(statusbar, segment):
+            intervals.append(strftime_interval(static_content(statusbar, segment) or ""))
+        elif segment.type == SegmentType.FUNCTION:
+            intervals.append(segment_refresh(segment)[1])
+    intervals = [interval for interval in intervals if interval]
+    return max(1, math.ceil(min(intervals))) if intervals else 0
+
+
+def static_content(statusbar, segment: Segment) -> str | None:
+    """
+    Returns the content of a segment as a tmux format, or None if the segment is skipped. A window
+    segment that has to be rendered by python is a `#(tmux-styler -sg ...)` job, the segments of a
+    compiled side are all inlined.
+    """
+    # String segment, escape % as the statusbar is passed through strftime
+    if segment.type == SegmentType.STRING:
+        return " " + segment.content.replace("%", "%%") + " "
+
+    # Unknown included segments are skipped, same as when rendering
+    if "." not in segment.content and segment.content not in DEFAULT_SEGMENTS:
+        return None
+
+    format = __format(statusbar, segment)
+    if format is None:
+        return f"#(tmux-styler -sg {segment_id(statusbar, segment)})"
+    return format
+
+
+def compile_side(statusbar, left_side: bool) -> str:
+    """
+    Returns the status-left or status-right format, see `compiles_side`.
+    """
+    from .Width import format_width
+
+    content = lambda segment: static_content(statusbar, segment)
+    if truncates_side(statusbar, left_side):
+        measure = lambda format: format_width(format, {})
+        active = fit_format(side_layout(statusbar, left_side, True, content), measure)
+        inactive = fit_format(side_layout(statusbar, left_side, False, content), measure)
+    else:
+        active = side_format(statusbar, left_side, True, content)
+        inactive = side_format(statusbar, left_side, False, content)
+    if active == inactive:
+        return active
+    # Whether the active window is first, for the left side, or last, for the right side
+    flag = "window_start_flag" if left_side else "window_end_flag"
+    return seg_if(f"#{{{flag}}}", active, inactive)
+
+
+def compile_window(statusbar, which: str) -> str:
+    """
+    Returns the window-status-current-format or window-status-format format.
+    """
+    return window_format(statusbar, which, lambda segment: static_content(statusbar, segment))
@@ -0,0 +1,246 @@
+"""
+Expands tmux formats in python, so the statusbar can be rendered without tmux.
+
+Only the subset of the format syntax tmux-styler emits is supported: variables (`#{var}` and the
+single letter aliases such as `#I`), conditionals (`#{?cond,then,else}`), comparisons (`#{==:a,b}`),
+arithmetic (`#{e|+:a,b}`), matches (`#{m/i:pattern,string}`), trimming (`#{=/-N/...:var}`) and the
+`##`, `#,` and `#}` escapes. Styles (`#[...]`) are kept, with the formats inside them expanded, see
+`strip_styles`. Shell commands (`#(...)`) expand to nothing.
+"""
+import re
+import fnmatch
+
+ALIASES = {
+    "D": "pane_id",
+    "F": "window_flags",
+    "H": "host",
+    "h": "host_short",
+    "I": "window_index",
+    "P": "pane_index",
+    "S": "session_name",
+    "T": "pane_title",
+    "W": "window_name",
+}
+"""
+Single letter aliases of variables, e.g. `#I` for `#{window_index}`.
+"""
+
+COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+OPERATORS = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "m": lambda a, b: a % b,
+    "%": lambda a, b: a % b,
+    "==": lambda a, b: int(a == b),
+    "!=": lambda a, b: int(a != b),
+    "<": lambda a, b: int(a < b),
+    ">": lambda a, b: int(a > b),
+    "<=": lambda a, b: int(a <= b),
+    ">=": lambda a, b: int(a >= b),
+}
+
+
+def __closing(format: str, start: int, open: str, close: str) -> int:
+    """
+    Returns the index of the character closing the block whose content starts at start, or -1.
+    """
+    depth = 1
+    idx = start
+    while idx < len(format):
+        char = format[idx]
+        if char == "#" and idx + 1 < len(format):
+            if format[idx + 1] == open:
+                depth += 1
+            idx += 2
+            continue
+        if char == close:
+            depth -= 1
+            if depth == 0:
+                return idx
+        idx += 1
+    return -1
+
+
+def __split(text: str) -> list[str]:
+    """
+    Splits the arguments of a block on the commas that aren't escaped or inside a nested block.
+    """
+    parts = []
+    depth = 0
+    start = 0
+    idx = 0
+    while idx < len(text):
+        char = text[idx]
+        if char == "#" and idx + 1 < len(text):
+            if text[idx + 1] == "{":
+                depth += 1
+            idx += 2
+            continue
+        if char == "}" and depth > 0:
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(text[start:idx])
+            start = idx + 1
+        idx += 1
+    parts.append(text[start:])
+    return parts
+
+
+def __value(text: str, context: dict[str, str]) -> str:
+    """
+    Returns the value of a variable, or the expansion of a format.
+    """
+    if "#" in text:
+        return expand(text, context)
+    return str(context.get(text, ""))
+
+
+def __true(value: str) -> bool:
+    """
+    Whether a value is true for tmux, non-empty and not "0".
+    """
+    return value != "" and value != "0"
+
+
+def __number(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 0
+
+
+def __block(body: str, context: dict[str, str]) -> str:
+    """
+    Expands the content of a `#{...}` block.
+    """
+    # Conditional, pairs of condition and value followed by the value if none is true
+    if body.startswith("?"):
+        parts = __split(body[1:])
+        while len(parts) >= 2:
+            if __true(__value(parts[0], context)):
+                return expand(parts[1], context)
+            parts = parts[2:]
+        return expand(parts[0], context) if parts else ""
+
+    # Variables don't contain colons, everything before the first one is a modifier
+    colon = body.find(":")
+    if colon == -1 or "#" in body[:colon]:
+        return __value(body, context)
+    modifier, rest = body[:colon], body[colon + 1:]
+
+    if modifier in COMPARISONS:
+        left, right = (__split(rest) + [""])[:2]
+        return "1" if COMPARISONS[modifier](expand(left, context), expand(right, context)) else "0"
+
+    if modifier in ("||", "&&"):
+        left, right = (__split(rest) + [""])[:2]
+        left, right = __true(expand(left, context)), __true(expand(right, context))
+        return "1" if (left or right if modifier == "||" else left and right) else "0"
+
+    if modifier.startswith("e|"):
+        flags = modifier.split("|")
+        operator = OPERATORS.get(flags[1] if len(flags) > 1 else "")
+        left, right = (__split(rest) + [""])[:2]
+        if operator is None:
+            return ""
+        try:
+            result = operator(__number(expand(left, context)),
+                              __number(expand(right, context)))
+        except ZeroDivisionError:
+            return ""
+        return f"{result:.2f}" if "f" in flags[2:] else str(int(result))
+
+    if modifier.startswith("m"):
+        flags = modifier[2:] if modifier.startswith("m/") else ""
+        pattern, string = (__split(rest) + [""])[:2]
+        pattern, string = expand(pattern, context), expand(string, context)
+        if "r" in flags:
+            match = re.search(pattern, string, re.IGNORECASE if "i" in flags else 0)
+            return "1" if match is not None else "0"
+        if "i" in flags:
+            pattern, string = pattern.lower(), string.lower()
+        return "1" if fnmatch.fnmatchcase(string, pattern) else "0"
+
+    if modifier.startswith("="):
+        # =N or =/N/marker, negative N keeps the end
+        if modifier.startswith("=/"):
+            length, _, marker = modifier[2:].partition("/")
+        else:
+            length, marker = modifier[1:], ""
+        value = __value(rest, context)
+        try:
+            length = int(length)
+        except ValueError:
+            return value
+        if length > 0 and len(value) > length:
+            return value[:length] + marker
+        if length < 0 and len(value) > -length:
+            return marker + value[length:]
+        return value
+
+    # Unsupported modifiers are ignored
+    return __value(rest, context)
+
+
+def expand(format: str, context: dict[str, str]) -> str:
+    """
+    Expands a tmux format with the given values of the context variables, variables that aren't
+    in the context expand to nothing.
+
+    Example:
+    ```python
+    expand("#{?window_active,#[bold],}#I #W", {"window_active": "1", "window_index": "1", "window_name": "nvim"})
+    # "#[bold]1 nvim"
+    ```
+    """
+    expanded = []
+    idx = 0
+    while idx < len(format):
+        char = format[idx]
+        if char != "#" or idx + 1 == len(format):
+            # Copy everything up to the next #
+            end = format.find("#", idx + 1)
+            if end == -1:
+                end = len(format)
+            expanded.append(format[idx:end])
+            idx = end
+            continue
+
+        next_char = format[idx + 1]
+        if next_char == "{":
+            end = __closing(format, idx + 2, "{", "}")
+            if end == -1:
+                expanded.append(format[idx:])
+                break
+            expanded.append(__block(format[idx + 2:end], context))
+            idx = end + 1
+        elif next_char == "(":
+            end = __closing(format, idx + 2, "(", ")")
+            idx = len(format) if end == -1 else end + 1
+        elif next_char in "#,}":
+            expanded.append(next_char)
+            idx += 2
+        elif next_char in ALIASES:
+            expanded.append(str(context.get(ALIASES[next_char], "")))
+            idx += 2
+        else:
+            expanded.append(format[idx:idx + 2])
+            idx += 2
+    return "".join(expanded)
+
+
+def strip_styles(text: str) -> str:
+    """
+    Removes the `#[...]` styles from an expanded format, leaving the displayed text.
+    """
+    return re.sub(r"#\[[^\]]*\]", "", text)
@@ -0,0 +1,450 @@
+"""
+Builds the tmux format strings for the statusbar sides and window list.
+
+The segment contents are supplied by the caller, so the same layout is used when rendering
+segments at redraw time and when compiling the statusbar into static formats at `Styler.style()` time.
+"""
+import math
+from typing import Callable
+
+from .Segment import Segment
+from .WindowList import WindowListAlignment
+
+SegmentContent = Callable[[Segment], str | None]
+"""
+Returns the formatted content of a segment, or None if the segment should be skipped.
+"""
+
+SLOT = "\x00"
+"""
+Surrounds the id of a segment rendered by python in a side layout, as in the render plan templates.
+"""
+
+
+def escape_commas(format: str) -> str:
+    """
+    Escapes the commas that are not inside a `#{...}` block so the format can be used
+    as a branch of a tmux conditional, e.g. the comma in `#[fg=red,bg=blue]`.
+    """
+    escaped = []
+    depth = 0
+    idx = 0
+    while idx < len(format):
+        char = format[idx]
+        if char == "#" and idx + 1 < len(format):
+            next_char = format[idx + 1]
+            if next_char == "{":
+                depth += 1
+            escaped.append(char + next_char)
+            idx += 2
+            continue
+        if char == "}" and depth > 0:
+            depth -= 1
+        elif char == "," and depth == 0:
+            char = "#,"
+        escaped.append(char)
+        idx += 1
+    return "".join(escaped)
+
+
+def seg_if(if_: str, then: str, else_: str) -> str:
+    """
+    if statement in the form of tmux format string.
+    """
+    return f"#{{?{if_},{escape_commas(then)},{escape_commas(else_)}}}"
+
+
+def style_content(segment: Segment, content: str) -> str:
+    """
+    Pads the content of a segment and applies the segment's style to it.
+    """
+    if segment.style is not None:
+        return f"#[{segment.style.apply()}] {content} #[default]"
+    return f" {content} "
+
+
+def segment_separator(statusbar, segment: Segment, next_segment: Segment | None, left_side: bool) -> str:
+    """
+    Returns the proper separator + formatting for between the segments.
+    """
+
+    # If the next segment is the last segment on that side
+    if next_segment is None:
+        end = statusbar.left_end_separator if left_side else statusbar.right_end_separator
+        separator_str = end.right_thick if left_side else end.left_thick
+        return f'#[bg=default,fg={segment.bg}]' + separator_str
+
+    # If the user has a separator defined
+    if segment.separator is not None:
+        return f'#[bg={next_segment.bg},fg={segment.bg}]' + segment.separator
+
+    separator = statusbar.segment_separator
+    # Segments with same bg color use a thin separator
+    if str(segment.bg) == str(next_segment.bg):
+        separator_str = separator.right_thin if left_side else separator.left_thin
+        return f'#[bg={segment.bg},fg={segment.fg}]' + separator_str
+    else:
+        separator_str = separator.right_thick if left_side else separator.left_thick
+        return f'#[bg={next_segment.bg},fg={segment.bg}]' + separator_str
+
+
+def side_format(statusbar, left_side: bool, active_flag: bool, content: SegmentContent) -> str:
+    """
+    Returns the format for the left or right side of the statusbar.
+
+    Parameters:
+    -----------
+    `statusbar`: Statusbar
+        The statusbar to build the side of.
+
+    `left_side`: bool
+        Whether to build the left side or the right side.
+
+    `active_flag`: bool
+        Whether the active window is first, for the left side, or last, for the right side.
+
+    `content`: SegmentContent
+        Returns the content of each segment.
+    """
+    # Get the segments from the Statusbar object
+    segments = statusbar.left_side if left_side else statusbar.right_side
+    if isinstance(segments, tuple):
+        segments = segments[0]
+
+    format = []
+    length = len(segments)
+    # Iterate over each segment
+    for idx, segment in enumerate(segments):
+        # Get the content of the segment, skip if empty
+        segment_content = content(segment)
+        if segment_content == None:
+            continue
+
+        if left_side:
+            next_segment: Segment | None = segments[idx +
+                                                    1] if idx < length - 1 else None
+            # If the window list is on the left side, than the next segment will actually be the first segment part of the window list
+            if statusbar.window_list.alignment == WindowListAlignment.LEFT and next_segment is None:
+                # If the active window is the first window
+                if active_flag:
+                    next_segment = statusbar.window_list.active
+                else:
+                    next_segment = statusbar.window_list.inactive
+
+            # Get the separator
+            separator = segment_separator(
+                statusbar, segment, next_segment, left_side)
+
+            # Build the segment
+            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
+            format.append(segment_content)
+            format.append(f"{separator}")
+
+        else:
+            next_segment: Segment | None = segments[idx -
+                                                    1] if idx > 0 else None
+            # If the window list is on the right side, than the first segment in the right side's next segment is part of the window list
+            if statusbar.window_list.alignment == WindowListAlignment.RIGHT and next_segment is None:
+                # If the active window is the last window
+                if active_flag:
+                    next_segment = statusbar.window_list.active
+                else:
+                    next_segment = statusbar.window_list.inactive
+
+            separator = segment_separator(
+                statusbar, segment, next_segment, left_side)
+
+            # Build the segment
+            format.append(f"{separator}")
+            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
+            format.append(segment_content)
+
+    return "".join(format)
+
+
+def side_layout(statusbar, left_side: bool, active_flag: bool, content: SegmentContent) -> dict:
+    """
+    Returns the segments of a side with their content and every separator that can follow them, so
+    the side can be assembled with some segments dropped, see `fit_side`. Takes the same parameters
+    as `side_format`, segments rendered by python are represented by a slot, their id between NULs.
+
+    `"separators"[i][j]` is the separator between segment i and segment j when j is displayed next to
+    it, the next segment on the left side and the previous one on the right side, and `[i][-1]` the
+    separator when no segment follows i.
+    """
+    segments = statusbar.left_side if left_side else statusbar.right_side
+    if isinstance(segments, tuple):
+        segments = segments[0]
+    displayed = [(segment, text) for segment in segments
+                 if (text := content(segment)) is not None]
+
+    # Past the end of the side is the window list when it is aligned to that side
+    alignment = WindowListAlignment.LEFT if left_side else WindowListAlignment.RIGHT
+    end = None
+    if statusbar.window_list.alignment == alignment:
+        end = statusbar.window_list.active if active_flag else statusbar.window_list.inactive
+
+    separators = []
+    for idx, (segment, _) in enumerate(displayed):
+        following = [segment_separator(statusbar, segment, other, left_side)
+                     if (other_idx > idx if left_side else other_idx < idx) else ""
+                     for other_idx, (other, _) in enumerate(displayed)]
+        following.append(segment_separator(statusbar, segment, end, left_side))
+        separators.append(following)
+
+    max_lengths = statusbar.left_side_max_length + statusbar.right_side_max_length
+    max_length = statusbar.left_side_max_length if left_side else statusbar.right_side_max_length
+    return {
+        "left": left_side,
+        "segments": [{"text": text, "open": f"#[fg={segment.fg},bg={segment.bg}]",
+                      "priority": segment.priority, "min_width": segment.min_width}
+                     for segment, text in displayed],
+        "separators": separators,
+        "max_length": max_length,
+        "share": max_length / max_lengths if max_lengths else 0,
+        "reserve": statusbar.window_list_min_width,
+    }
+
+
+def side_width(layout: dict, client_width: int) -> int:
+    """
+    Returns the number of cells a side may take on a client, its share of what the window list leaves
+    and at most its max length.
+    """
+    available = max(0, client_width - layout["reserve"])
+    return min(layout["max_length"], int(available * layout["share"]))
+
+
+def assemble_side(layout: dict, displayed: list[int]) -> str:
+    """
+    Returns the format of a side with only the given segments of its layout, in order.
+    """
+    format = []
+    for pos, idx in enumerate(displayed):
+        segment = layout["segments"][idx]
+        if layout["left"]:
+            following = displayed[pos + 1] if pos + 1 < len(displayed) else -1
+            format.extend((segment["open"], segment["text"], layout["separators"][idx][following]))
+        else:
+            following = displayed[pos - 1] if pos > 0 else -1
+            format.extend((layout["separators"][idx][following], segment["open"], segment["text"]))
+    return "".join(format)
+
+
+def __total(layout: dict, displayed: list[int], width: Callable[[int], int],
+            measure: Callable[[str], int]) -> int:
+    """
+    Returns the width of a side with only the given segments of its layout, separators included.
+    """
+    total = 0
+    for pos, idx in enumerate(displayed):
+        following = pos + 1 if layout["left"] else pos - 1
+        following = displayed[following] if 0 <= following < len(displayed) else -1
+        total += width(idx) + measure(layout["separators"][idx][following])
+    return total
+
+
+def __lowest(layout: dict, displayed: list[int]) -> int | None:
+    """
+    Returns the segment dropped next, the lowest priority and of equal priorities the last one,
+    or None if none of the displayed segments can be dropped.
+    """
+    droppable = [idx for idx in displayed if layout["segments"][idx]["priority"] is not None]
+    if not droppable:
+        return None
+    return min(reversed(droppable), key=lambda idx: layout["segments"][idx]["priority"])
+
+
+def __fit(layout: dict, displayed: list[int], budget: int, width: Callable[[int], int],
+          measure: Callable[[str], int]) -> list[int]:
+    """
+    Drops segments until the displayed ones take at most budget cells or none can be dropped.
+    """
+    displayed = list(displayed)
+    while __total(layout, displayed, width, measure) > budget:
+        lowest = __lowest(layout, displayed)
+        if lowest is None:
+            break
+        displayed.remove(lowest)
+    return displayed
+
+
+def __min_client_width(layout: dict, total: int) -> int | None:
+    """
+    Returns the narrowest client a side taking total cells fits, or None if it fits none.
+    """
+    if total <= 0:
+        return 0
+    if total > layout["max_length"] or layout["share"] <= 0:
+        return None
+    client_width = layout["reserve"] + math.ceil(total / layout["share"]) - 1
+    while side_width(layout, client_width) < total:
+        client_width += 1
+    return client_width
+
+
+def fit_format(layout: dict, measure: Callable[[str], int]) -> str:
+    """
+    Returns the format of a side that drops segments to fit the client, for a layout without slots.
+    The drops are compiled into `#{?#{e|>:#{client_width},N},...}` conditionals, so tmux picks the
+    segments to display itself. Segments are counted with the width of their format, variables
+    expanded to nothing, or their `min_width` if larger.
+    """
+    segments = layout["segments"]
+
+    def width(idx: int) -> int:
+        return max(segments[idx]["min_width"], measure(segments[idx]["text"]))
+
+    # The segments displayed as the client gets narrower, with the narrowest client they fit
+    steps = []
+    displayed = list(range(len(segments)))
+    while (lowest := __lowest(layout, displayed)) is not None:
+        steps.append((__min_client_width(layout, __total(layout, displayed, width, measure)),
+                      list(displayed)))
+        displayed.remove(lowest)
+
+    format = assemble_side(layout, displayed)
+    for client_width, shown in reversed(steps):
+        if client_width is not None:
+            format = seg_if(f"#{{e|>:#{{client_width}},{client_width - 1}}}",
+                            assemble_side(layout, shown), format)
+    return format
+
+
+def fit_side(layout: dict, client_width: int, render: Callable[[list[str]], dict[str, str]],
+             measure: Callable[[str], int], estimate: Callable[[str], int]) -> tuple[list[int], dict[str, str]]:
+    """
+    Drops the segments with the lowest priority until a side fits the client, returns the indices of
+    the segments displayed and the content of their slots.
+
+    Segments are dropped based on an estimate of their width before anything is rendered, so dropped
+    segments are never rendered, then again with the width of the rendered content.
+
+    Parameters:
+    -----------
+    `layout`: dict
+        The side, see `side_layout`.
+
+    `client_width`: int
+        Width of the client in cells.
+
+    `render`: Callable[[list[str]], dict[str, str]]
+        Renders the given slots, returns their content by slot.
+
+    `measure`: Callable[[str], int]
+        Returns the number of cells a tmux format is drawn in.
+
+    `estimate`: Callable[[str], int]
+        Returns the estimated number of cells of a slot that isn't rendered yet, counted as at least
+        the segment's `min_width`.
+    """
+    segments = layout["segments"]
+    budget = side_width(layout, client_width)
+
+    def width(contents: dict[str, str]) -> Callable[[int], int]:
+        def segment_width(idx: int) -> int:
+            segment = segments[idx]
+            text = segment["text"]
+            if SLOT in text:
+                slot = text.split(SLOT)[1]
+                if slot not in contents:
+                    return max(segment["min_width"], estimate(slot))
+                text = contents[slot]
+            return max(segment["min_width"], measure(text))
+        return segment_width
+
+    displayed = __fit(layout, range(len(segments)), budget, width({}), measure)
+    contents = render([segments[idx]["text"].split(SLOT)[1] for idx in displayed
+                       if SLOT in segments[idx]["text"]])
+    return __fit(layout, displayed, budget, width(contents), measure), contents
+
+
+def window_format(statusbar, which: str, content: SegmentContent) -> str:
+    """
+    Returns the format for the active or inactive window in the window list.
+
+    Parameters:
+    -----------
+    `statusbar`: Statusbar
+        The statusbar to build the window list of.
+
+    `which`: str
+        "active" or "inactive".
+
+    `content`: SegmentContent
+        Returns the content of the window segment.
+    """
+    active_segment = statusbar.window_list.active
+    inactive_segment = statusbar.window_list.inactive
+    # Get the segment from the Statusbar object
+    if which == "active":
+        segment = active_segment
+    else:
+        segment = inactive_segment
+
+    # Get the content of the segment
+    segment_content = content(segment) or ""
+
+    # Build the segment
+    format = []
+
+    alignment = statusbar.window_list.alignment
+
+    # The separator for each window in the list needs some additional logic
+    # which we'll implement using tmux format stings to be fast rather than
+    # using python logic
+    is_last = "#{window_end_flag}"
+    is_first = "#{window_start_flag}"
+    is_one_less_than_active = "#{==:#I,#{e|-:#{active_window_index},1}}"
+    is_one_more_than_active = "#{==:#I,#{e|+:#{active_window_index},1}}"
+
+    separator = statusbar.segment_separator
+    match alignment:
+        case WindowListAlignment.LEFT:
+            end_separator = statusbar.left_end_separator
+
+            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
+            format.append(segment_content)
+            format.append(f"#[fg={segment.bg},bg=default]")
+
+            if which == "active":
+                format.append(
+                    seg_if(is_last, f'#[fg={active_segment.bg}]' + end_separator.right_thick, f'#[fg={active_segment.bg},bg={inactive_segment.bg}]' + separator.right_thick))
+            else:
+                when_last = f'#[fg={inactive_segment.bg}]' + \
+                    end_separator.right_thick
+                when_not_last = f'#[fg={inactive_segment.fg},bg={inactive_segment.bg}]' + \
+                    separator.right_thin
+
+                format.append(
+                    seg_if(is_last, when_last, seg_if(is_one_less_than_active, f'#[bg={active_segment.bg}]' + separator.right_thick, when_not_last)))
+
+        case WindowListAlignment.RIGHT:
+            end_separator = statusbar.right_end_separator
+
+            if which == "active":
+                format.append(
+                    seg_if(is_first, f'#[fg={active_segment.bg}]' + end_separator.left_thick, f'#[fg={active_segment.bg},bg={inactive_segment.bg}]' + separator.left_thick))
+            else:
+                format.append(f"#[fg={inactive_segment.bg}]")
+                when_first = end_separator.left_thick
+                when_not_first = f'#[fg={inactive_segment.fg},bg={inactive_segment.bg}]' + \
+                    separator.left_thin
+
+                format.append(
+                    seg_if(is_first, when_first, seg_if(is_one_more_than_active, f'#[bg={active_segment.bg}]' + separator.left_thick, when_not_first)))
+
+            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
+            format.append(segment_content)
+
+        case _:
+            # TODO: More elegant solution for the center alignments?
+            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
+            if segment.style is not None:
+                format.append(f"#[{segment.style.apply()}]")
+            format.append(segment_content)
+            format.append("#[default]")
+            format.append(
+                seg_if(is_last, "", f"#[fg={active_segment.fg},bg={active_segment.bg}] "))
+
+    return "".join(format)
@@ -23,7 +23,7 @@ class Segment:
     A segment is a part of the statusbar that displays some content.
     """
 
-    def __init__(self, segment_type: SegmentType, content: str, bg: Color = NamedColor.DEFAULT, fg: Color = NamedColor.DEFAULT, separator: str | None = None, style: Style | None = None):
+    def __init__(self, segment_type: SegmentType, content: str, bg: Color = NamedColor.DEFAULT, fg: Color = NamedColor.DEFAULT, separator: str | None = None, style: Style | None = None, ttl: float | None = None, timeout: float | None = None, events: list[str] | None = None, priority: int | None = None, min_width: int = 0):
         """
         Creates a Segment object.
 
@@ -50,12 +50,40 @@ class Segment:
         `style`: Style
             The style of the segment (optional). Specifying a style object that has colors will override the bg and fg parameters
             with the colors from the style object.
+
+        `ttl`: float | None
+            Optionally cache the content of a function segment for this many seconds. The cache is shared by every
+            redraw and client, so an expensive segment only runs once per ttl. By default the content isn't cached.
+
+        `timeout`: float | None
+            Optionally specify how many seconds a function segment may take to render, overrides the Statusbar's
+            segment_timeout. When the segment takes longer its last rendered content is displayed instead.
+
+        `events`: list[str] | None
+            Optionally specify the tmux hooks after which the content of the segment changes, used when the Statusbar's
+            refresh_mode is `RefreshMode.EVENTS`. Overrides what the segment function declares with `refresh`, see
+            `REFRESH_EVENTS` for the available hooks. By default the segment is re-rendered after every event.
+
+        `priority`: int | None
+            Optionally let the segment be dropped when its side doesn't fit the client's width, segments with the
+            lowest priority are dropped first. Dropped segments aren't rendered at all. By default the segment is
+            always displayed. Only used for segments on the left and right side.
+
+        `min_width`: int
+            The number of cells the segment is counted as taking at least when dropping segments. The content of
+            function segments is otherwise estimated from the width it was last rendered with, and tmux formats from
+            their width with the variables expanded to nothing, e.g. `#{session_name}`. Defaults to 0.
         """
         self.type = segment_type
         self.content = content
         self.bg = bg
         self.fg = fg
         self.separator = separator
+        self.ttl = ttl
+        self.timeout = timeout
+        self.events = events
+        self.priority = priority
+        self.min_width = min_width
 
         if style is not None and style.bg is not None:
             self.bg = style.bg
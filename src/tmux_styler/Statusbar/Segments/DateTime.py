@@ -1,6 +1,8 @@
-from . import DefinedSegment
+from . import DefinedSegment, refresh, tmux_format
 
 
+@tmux_format(lambda: "%A")
+@refresh(interval=60)
 def date_day() -> DefinedSegment:
     """
     The current day of the week.
@@ -10,6 +12,8 @@ def date_day() -> DefinedSegment:
     return current_date.strftime("%A")
 
 
+@tmux_format(lambda format="%Y-%m-%d": format)
+@refresh(interval=60)
 def date(format="%Y-%m-%d") -> DefinedSegment:
     """
     The current date.
@@ -24,6 +28,8 @@ def date(format="%Y-%m-%d") -> DefinedSegment:
     return current_date.strftime(format)
 
 
+@tmux_format(lambda format="%H:%M": format)
+@refresh(interval=1)
 def time(format="%H:%M") -> DefinedSegment:
     """
     The current time.
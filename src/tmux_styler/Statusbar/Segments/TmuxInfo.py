@@ -1,7 +1,9 @@
-from . import DefinedSegment
+from . import DefinedSegment, context, refresh, tmux_format
 from ...ContextVars import ContextVar
 
 
+@tmux_format()
+@refresh("after-select-window", "window-renamed", "after-new-window", "window-linked", "window-unlinked")
 def window_info() -> DefinedSegment:
     """
     Segment that displays window information, the window index, flags, and name.
@@ -9,6 +11,8 @@ def window_info() -> DefinedSegment:
     return [ContextVar.WINDOW_INDEX, ContextVar.WINDOW_FLAGS, " | ", ContextVar.WINDOW_NAME]
 
 
+@tmux_format()
+@refresh("client-session-changed", "session-renamed")
 def session_name() -> DefinedSegment:
     """
     The name of the current session.
@@ -16,7 +20,9 @@ def session_name() -> DefinedSegment:
     return [ContextVar.SESSION_NAME]
 
 
-def cwd(max_length: int = 30) -> DefinedSegment:
+@refresh("after-select-pane", "after-select-window", "pane-focus-in", "client-session-changed", interval=5)
+@context(ContextVar.PANE_CURRENT_PATH)
+def cwd(pane_current_path: str, max_length: int = 30) -> DefinedSegment:
     """
     The current/present working directory.
 
@@ -25,7 +31,7 @@ def cwd(max_length: int = 30) -> DefinedSegment:
     `max_length` (int):
         The maximum length of the path. Defaults to 30.
     """
-    path = ContextVar.PANE_CURRENT_PATH.current_value()[1:-1]
+    path = pane_current_path
     if len(path) > max_length:
         path = path[-max_length+3:]
         index = path.find("/")
@@ -1,3 +1,6 @@
+import functools
+from typing import Callable
+
 from ...ContextVars import *
 
 DefinedSegment = str | ContextVar | list[str | ContextVar]
@@ -7,6 +10,103 @@ function that returns a "DefinedSegment" type. A segment can display a string, a
 or a list of strings and/or ContextVars that will get joined together.
 """
 
+
+def tmux_format(format: Callable[..., DefinedSegment] | None = None):
+    """
+    Decorator marking a segment whose output can be expressed as a plain tmux format, so that
+    `Styler.style()` can inline it into the statusbar instead of running python on every redraw.
+
+    Parameters:
+    -----------
+    `format` (Callable[..., DefinedSegment] | None):
+        Takes the same arguments as the segment and returns the equivalent tmux format, e.g. a
+        strftime format for the date or `ContextVar`s. When omitted the segment itself is used,
+        which must then only return `ContextVar`s and strings that don't change between redraws.
+
+    Example:
+    ```python
+    @tmux_format(lambda: [ContextVar.HOST_SHORT])
+    def host() -> DefinedSegment:
+        return ContextVar.HOST_SHORT.current_raw_value()
+    ```
+    """
+    def decorator(func):
+        func.tmux_format = format if format is not None else func
+        return func
+    return decorator
+
+
+def context(*vars: ContextVar):
+    """
+    Decorator declaring the `ContextVar`s a segment needs. The values are passed to the segment as
+    keyword arguments named after the variables, e.g. `pane_current_path`. When rendering, the
+    variables of every segment of the statusbar are resolved together in a single call to tmux.
+
+    Called directly, the segment resolves the missing variables itself with `current_values`.
+
+    Example:
+    ```python
+    @context(ContextVar.PANE_CURRENT_PATH, ContextVar.PANE_CURRENT_COMMAND)
+    def pane(pane_current_path: str, pane_current_command: str) -> DefinedSegment:
+        return f"{pane_current_command} in {pane_current_path}"
+    ```
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            missing = [var for var in vars if var.value not in kwargs]
+            if missing:
+                kwargs.update(
+                    zip([var.value for var in missing], current_values(missing)))
+            return func(*args, **kwargs)
+        wrapper.context_vars = vars
+        return wrapper
+    return decorator
+
+
+REFRESH_EVENTS = [
+    "after-select-window",
+    "after-select-pane",
+    "pane-focus-in",
+    "client-session-changed",
+    "session-renamed",
+    "window-renamed",
+    "after-new-window",
+    "window-linked",
+    "window-unlinked",
+]
+"""
+tmux hooks that refresh the statusbar when `Statusbar.refresh_mode` is `RefreshMode.EVENTS`.
+"""
+
+
+def refresh(*events: str, interval: float | None = None):
+    """
+    Decorator declaring when the content of a segment changes, used when `Statusbar.refresh_mode` is
+    `RefreshMode.EVENTS`. Segments that don't declare anything are re-rendered after every event.
+
+    Parameters:
+    -----------
+    `events` (str):
+        tmux hooks after which the content may have changed, from `REFRESH_EVENTS`.
+
+    `interval` (float | None):
+        Re-render the segment every interval seconds, for content that changes over time.
+
+    Example:
+    ```python
+    @refresh("after-select-window", "window-renamed")
+    def window_name() -> DefinedSegment:
+        ...
+    ```
+    """
+    def decorator(func):
+        func.refresh_events = list(events)
+        func.refresh_interval = interval
+        return func
+    return decorator
+
+
 # TODO: Find a better way to do this, dynamic generation via CI?
 # Default/included segments, format "segment_name": "module_name"
 DEFAULT_SEGMENTS = {
@@ -1,6 +1,5 @@
 from enum import Enum
-from typing import Any, Dict
-import pickle
+from typing import Any, Dict, List
 
 from .WindowList import WindowList
 from ..Style import *
@@ -99,6 +98,28 @@ class Separators(Enum):
     """
 
 
+class RefreshMode(Enum):
+    """
+    How the statusbar is kept up to date.
+    """
+    INTERVAL = "interval"
+    """
+    Redraw the whole statusbar every `Statusbar.status_interval` seconds.
+    """
+    EVENTS = "events"
+    """
+    Redraw the statusbar when a tmux hook signals a change, only re-rendering the segments that depend
+    on that event, see `refresh`. Segments that change over time keep their own interval, the shortest of
+    which becomes the status-interval. Without such segments an idle tmux doesn't redraw at all.
+    """
+
+
+HOOK_INDEX = 71
+"""
+Index of the tmux-styler command in the hooks it installs, so hooks set by the user are left alone.
+"""
+
+
 class Statusbar:
     """
     Represents the tmux statusbar.
@@ -135,12 +156,20 @@ class Statusbar:
 
     left_side_max_length: int = 60
     """
-    The maximum length of the left side of the statusbar. Defaults to 60.
+    The maximum length of the left side of the statusbar, tmux cuts off what is longer. When segments of the side
+    have a `priority` they are dropped as a whole to fit instead. Defaults to 60.
     """
 
     right_side_max_length: int = 90
     """
-    The maximum length of the right side of the statusbar. Defaults to 90.
+    The maximum length of the right side of the statusbar, tmux cuts off what is longer. When segments of the side
+    have a `priority` they are dropped as a whole to fit instead. Defaults to 90.
+    """
+
+    window_list_min_width: int = 20
+    """
+    The width kept for the window list when segments with a priority are dropped to fit the client, the
+    rest of the client's width is shared by the sides in proportion to their max length. Defaults to 20.
     """
 
     window_list: WindowList
@@ -215,7 +244,12 @@ class Statusbar:
 
     status_interval: int = 1
     """
-    The interval in seconds at which the statusbar will be redrawn.
+    The interval in seconds at which the statusbar will be redrawn. Only used when refresh_mode is `RefreshMode.INTERVAL`.
+    """
+
+    refresh_mode: RefreshMode = RefreshMode.INTERVAL
+    """
+    Whether to redraw the statusbar every status_interval or when tmux hooks signal a change. Defaults to `RefreshMode.INTERVAL`.
     """
 
     visible: bool = True
@@ -223,6 +257,33 @@ class Statusbar:
     Whether the statusbar is initially visible or not .
     """
 
+    segment_timeout: float = 1
+    """
+    How many seconds a function segment may take to render before its last rendered content is displayed instead.
+    Segments on a side are rendered concurrently, so a side takes at most as long as its slowest timeout. Defaults to 1.
+    """
+
+    compile_formats: bool = True
+    """
+    Whether to compile the statusbar into tmux formats when styling. Segments that can be expressed as a tmux
+    format are inlined, a side with other segments is rendered by a single python job on redraw that only runs
+    those. When False, each side and window is rendered by python on every redraw. Defaults to True.
+    """
+
+    profile_segments: bool = False
+    """
+    Whether to record the wall time, CPU time, import time and exceptions of every segment render in a log,
+    summarized by `tmux-styler profile`. Can also be enabled with `tmux set-environment -g TMUX_STYLER_PROFILE 1`.
+    Defaults to False.
+    """
+
+    record_metrics: bool = False
+    """
+    Whether every render updates the metrics shown by `tmux-styler stats`: segment render times, cache hits,
+    timeouts and the render jobs tmux spawned. Can also be enabled with
+    `tmux set-environment -g TMUX_STYLER_METRICS 1`. Defaults to False.
+    """
+
     def __init__(self, left_side: tuple[list[Segment], Style] | list[Segment], right_side: tuple[list[Segment], Style] | list[Segment], window_list: WindowList):
         """
         Creates the Statusbar object.
@@ -242,13 +303,128 @@ class Statusbar:
         self.right_side = right_side
         self.window_list = window_list
 
-    def __pickle(self) -> bytes:
+    def render(self, context: Dict[str, str], windows: List[Dict[str, str]] | None = None, timestamp: float | None = None) -> str:
         """
-        Pickles the Statusbar object and returns the pickled bytes.
-        """
-        return pickle.dumps(self)
+        Renders the statusbar without tmux, e.g. for previews, tests and benchmarks. Returns the left side,
+        the window list and the right side one after the other, with the `#[...]` styles, see `strip_styles`.
+
+        Segments are rendered as they are in tmux: inlined segments are expanded from their tmux format and the
+        other segments are called with the context variables they declare with `context` taken from the context.
+        When the context has a `"client_width"`, segments with a priority are dropped to fit it.
 
-    def __commands(self) -> list[str]:
+        Parameters:
+        -----------
+        `context`: Dict[str, str]
+            Values of the context variables, keyed by their name e.g. `"session_name"`. Variables that aren't
+            in the context expand to nothing.
+
+        `windows`: List[Dict[str, str]] | None
+            Values of the context variables that differ for each window of the window list, e.g. `"window_index"`,
+            `"window_name"` and `"window_active"`. Defaults to a single window.
+
+        `timestamp`: float | None
+            Time the statusbar is rendered at, as seconds since the epoch. Defaults to now.
+        """
+        import re
+        import time
+        from .Format import expand
+        from .Compiler import compiles_side, is_inlined, static_content, truncates_side
+        from .Segments import DEFAULT_SEGMENTS
+        from .Render import assemble_side, fit_format, fit_side, side_format, side_layout, window_format
+        from .Width import format_width
+
+        now = time.localtime(timestamp)
+        windows = windows if windows is not None else [{}]
+        active = next((idx for idx, window in enumerate(windows)
+                       if window.get("window_active", "1") == "1"), 0)
+        active_index = windows[active].get(
+            "window_index", context.get("window_index", ""))
+
+        def render_format(build, values: Dict[str, str]) -> str:
+            segments: List[Segment] = []
+            contents: Dict[str, str] = {}
+
+            def content(segment: Segment) -> str | None:
+                if is_inlined(self, segment):
+                    return static_content(self, segment)
+                # Unknown included segments are skipped, same as when rendering
+                if "." not in segment.content and segment.content not in DEFAULT_SEGMENTS:
+                    return None
+                segments.append(segment)
+                return f"\x00{len(segments) - 1}\x00"
+
+            def render(slots: List[str]) -> Dict[str, str]:
+                # Segments are only rendered once they are displayed
+                for slot in slots:
+                    if slot not in contents:
+                        contents[slot] = self.__python_content(segments[int(slot)], values)
+                return contents
+
+            # Like tmux, only the format itself goes through strftime, not the output of segments.
+            # Each directive on its own, strftime may drop characters the locale can't encode
+            parts = build(content, render).split("\x00")
+            format = "".join(re.sub(r"%(.)", lambda match: time.strftime(match[0], now), part)
+                             if idx % 2 == 0 else render([part])[part]
+                             for idx, part in enumerate(parts))
+            format = format.replace(
+                str(ContextVar.PANE_CURRENT_COMMAND), "#{pane_current_command}")
+            return expand(format, values)
+
+        def side(left_side: bool, active_flag: bool):
+            def build(content, render) -> str:
+                if "client_width" not in values or not truncates_side(self, left_side):
+                    return side_format(self, left_side, active_flag, content)
+                layout = side_layout(self, left_side, active_flag, content)
+                # Like tmux, a compiled side drops segments based on the width of their formats
+                if compiles_side(self, left_side):
+                    return fit_format(layout, lambda format: format_width(format, {}))
+                displayed, _ = fit_side(layout, int(values["client_width"]), render,
+                                        lambda format: format_width(format, values), lambda _: 0)
+                return assemble_side(layout, displayed)
+            return build
+
+        values = {**context, "active_window_index": active_index}
+        left = render_format(side(True, active == 0), values)
+        right = render_format(side(False, active == len(windows) - 1), values)
+
+        window_list = []
+        for idx, window in enumerate(windows):
+            window_values = {
+                **values,
+                "window_start_flag": "1" if idx == 0 else "0",
+                "window_end_flag": "1" if idx == len(windows) - 1 else "0",
+                "window_active": "1" if idx == active else "0",
+                **window,
+            }
+            which = "active" if idx == active else "inactive"
+            window_list.append(render_format(lambda content, _: window_format(
+                self, which, content), window_values))
+
+        return left + "".join(window_list) + right
+
+    def __python_content(self, segment: Segment, context: Dict[str, str]) -> str:
+        """
+        Returns the formatted content of a segment rendered by python for `render`.
+        """
+        from .Compiler import segment_function
+        from .Render import style_content
+
+        function = segment_function(segment)
+        try:
+            if function is None:
+                raise ImportError(f"Can't import segment {segment.content}")
+            function, func = function
+            args = (self.segment_data or {}).get(func) or {}
+            values = {var.value: context.get(var.value, "")
+                      for var in getattr(function, "context_vars", ())}
+            content = function(**args, **values)
+        except Exception as e:
+            content = str(e)
+        if isinstance(content, list):
+            content = "".join(map(str, content))
+        return style_content(segment, str(content))
+
+    def __commands(self) -> list[list[str]]:
         """
         Returns the tmux commands to be run to update the statusbar.
         """
@@ -260,21 +436,60 @@ class Statusbar:
         else:
             self.default_style = Style(self.default_bg, self.default_fg)
 
+        from .Segments import REFRESH_EVENTS
+        from .Compiler import refresh_events, refresh_interval
+        if self.refresh_mode == RefreshMode.EVENTS:
+            status_interval = refresh_interval(self)
+            events = refresh_events(self)
+        else:
+            status_interval = self.status_interval
+            events = []
+        # Install the hooks of the events the segments depend on and remove the others
+        hook_commands = []
+        for event in REFRESH_EVENTS:
+            if event in events:
+                hook_commands.append(["set-hook", "-g", f"{event}[{HOOK_INDEX}]",
+                                      f"run-shell -b 'tmux-styler --invalidate {event}'"])
+            else:
+                hook_commands.append(
+                    ["set-hook", "-gu", f"{event}[{HOOK_INDEX}]"])
+
+        from .Compiler import compile_side, compile_window, compiles_side, truncates_side
+        # Sides dropping segments to fit that aren't compiled are rendered by python, given the width of the client
+        left = "#(tmux-styler -sl #{window_start_flag})"
+        right = "#(tmux-styler -sr #{window_end_flag})"
+        if compiles_side(self, True):
+            left = compile_side(self, True)
+        elif truncates_side(self, True):
+            left = "#(tmux-styler -sl #{window_start_flag} -w #{client_width})"
+        if compiles_side(self, False):
+            right = compile_side(self, False)
+        elif truncates_side(self, False):
+            right = "#(tmux-styler -sr #{window_end_flag} -w #{client_width})"
+        if self.compile_formats:
+            window_commands = self.window_list._WindowList__commands(
+                compile_window(self, "active"), compile_window(self, "inactive"))
+        else:
+            window_commands = self.window_list._WindowList__commands()
+
         return [
-            *self.window_list._WindowList__commands(),
+            *window_commands,
             # visible
-            f'tmux set -g status {"on" if self.visible else "off"}',
+            ["set", "-g", "status", "on" if self.visible else "off"],
             # interval
-            f'tmux set -g status-interval {self.status_interval}',
+            ["set", "-g", "status-interval", str(status_interval)],
+            *hook_commands,
             # Default Style
-            f'tmux set -g status-style "{str(self.default_style)}"',
+            ["set", "-g", "status-style", str(self.default_style)],
             # Lengths
-            f'tmux set -g status-left-length {self.left_side_max_length}',
-            f'tmux set -g status-right-length {self.right_side_max_length}',
+            ["set", "-g", "status-left-length", str(self.left_side_max_length)],
+            ["set", "-g", "status-right-length", str(self.right_side_max_length)],
 
             # Left/Right Side
-            'tmux set -g status-left "#(tmux-styler -sl #{window_start_flag})"',
-            f'tmux set -g status-left-style "{str(self.left_side[1]) if isinstance(self.left_side, tuple) else "default"}"',
-            'tmux set -g status-right "#(tmux-styler -sr #{window_end_flag})"',
-            f'tmux set -g status-right-style "{str(self.right_side[1]) if isinstance(self.right_side, tuple) else "default"}"',
+            ["set", "-g", "status-left", left],
+            ["set", "-g", "status-left-style",
+                str(self.left_side[1]) if isinstance(self.left_side, tuple) else "default"],
+            ["set", "-g", "status-right", right],
+            ["set", "-g", "status-right-style",
+                str(self.right_side[1]) if isinstance(self.right_side, tuple) else "default"],
         ]
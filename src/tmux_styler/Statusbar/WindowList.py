@@ -73,17 +73,17 @@ class WindowList:
         self.active = active
         self.inactive = inactive
 
-    def __commands(self) -> list[str]:
+    def __commands(self, active_format: str = "#(tmux-styler -sw active)", inactive_format: str = "#(tmux-styler -sw inactive)") -> list[list[str]]:
         """
-        Returns the commands to run to get the window list
+        Returns the tmux commands to run to get the window list, optionally with the formats compiled by the Statusbar
         """
         return [
             # Justify
-            f'tmux set -g status-justify {str(self.alignment)}',
+            ["set", "-g", "status-justify", str(self.alignment)],
             # Active
-            'tmux set -g window-status-current-format "#(tmux-styler -sw active)"',
+            ["set", "-g", "window-status-current-format", active_format],
             # Inactive
-            'tmux set -g window-status-format "#(tmux-styler -sw inactive)"',
+            ["set", "-g", "window-status-format", inactive_format],
             # Handle separators myself
-            f'tmux set -g window-status-separator ""',
+            ["set", "-g", "window-status-separator", ""],
         ]
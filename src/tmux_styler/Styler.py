@@ -2,7 +2,6 @@
 Styler object for styling tmux.
 """
 
-import json
 import os
 from typing import Dict, List
 from enum import Enum
@@ -43,6 +42,30 @@ class PaneBorderLineStyle(Enum):
         return self.value
 
 
+class CurrentCommandMode(Enum):
+    """
+    How `ContextVar.PANE_CURRENT_COMMAND` is resolved.
+
+    - PROCESS: a `tmux-styler` job per pane on every redraw looks up the command of its pane
+    - BATCH: a single job in the statusbar looks up the command of every pane of the session at once and
+      stores it in the `@styler_cmd` pane option, which the formats read. Requires the statusbar to be visible.
+    - NATIVE: tmux's own `#{pane_current_command}`, with the glyphs compiled into tmux format conditionals so no
+      python runs at all. `current_command_max_depth` and glyphs for command lines ("re:" keys) aren't supported.
+    """
+    PROCESS = "process"
+    BATCH = "batch"
+    NATIVE = "native"
+
+    def __str__(self):
+        return self.value
+
+
+APPLIED_OPTION = "@tmux-styler-applied"
+"""
+User option holding the digest of the applied commands that can't be compared with the options' values.
+"""
+
+
 class Styler:
     """
     Styler for tmux.
@@ -101,6 +124,9 @@ class Styler:
     Whenever `ContextVar.PANE_CURRENT_COMMAND` is used, this is the maximum depth to search for the
     currently running command in the process tree. Defaults to 1.
 
+    Only used where the foreground process of the pane's terminal can't be read from /proc, e.g. macOS,
+    otherwise the foreground process is used regardless of its depth.
+
     Useful to change when you are commonly running processes/commands that spawn other processes
     e.g. you use fig for terminal command completion, tmux given a depth of 1 only looks at 
     first process spawned by a pane's root process. In this case tmux will see fig at depth 0
@@ -125,43 +151,80 @@ class Styler:
     node, rust, go, etc.), common tools (git, less, docker), shells (bash, zsh, fish, etc.) and many more.
 
     If you want to add a glyph for a process or change a default, pass a dictionary mapping process names to glyphs.
+    A name ending with "*" matches every process starting with it, and a key starting with "re:" is a regular
+    expression matched against the full command line. The process names you pass are checked first, then the
+    regular expressions, then the default process names and the prefixes. `style()` raises a `ValueError` if a
+    regular expression is invalid.
 
-    e.g. if you want to use a different icon for "node":
+    e.g. if you want to use a different icon for "node", every "deno" version and jupyter notebooks:
     ```python
     styler = Styler()
-    styler.current_command_glyphs = {"node": "󰇷"}
+    styler.current_command_glyphs = {"node": "󰇷", "deno*": "", r"re:\\bjupyter[- ]notebook\\b": ""}
     ```
     """
 
-    def style(self):
+    current_command_mode: CurrentCommandMode = CurrentCommandMode.PROCESS
+    """
+    How the current command is looked up, see `CurrentCommandMode`. Defaults to `CurrentCommandMode.PROCESS`.
+    """
+
+    apply_changes_only: bool = True
+    """
+    Whether to only set the tmux options that differ from their current values when styling, so reloading an
+    unchanged config doesn't make tmux redraw. Defaults to True.
+    """
+
+    render_server: bool = True
+    """
+    Whether to render the statusbar and current command through a long-lived render server
+    instead of starting a new python process for every redraw. The server is started on first use
+    and shuts down on its own when idle. Defaults to True.
+    """
+
+    subscribe_context: bool = False
+    """
+    Whether the render server should have tmux push the values of the context variables used by
+    segments when they change, instead of asking tmux for them on every redraw. tmux checks for
+    changes once a second, so a value can be up to a second old. Requires tmux 3.2+. Defaults to False.
+
+    The values are pushed to a control mode client the render server attaches to a session, it is
+    listed by `list-clients` and counts towards that session's `session_attached`. Values are only
+    taken from it for the pane of a redraw, lookups without a pane run `tmux display-message`.
+    """
+
+    def __write_plan(self) -> dict:
         """
-        Style tmux. Call at the end of your config file to style tmux.
+        Writes the statusbar and the current command glyphs/settings as the render plan,
+        returns the glyph rules.
         """
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        path = os.path.join(current_dir, ".user")
-        # create the .user directory if it doesn't exist
-        if not os.path.exists(path):
-            os.mkdir(path)
-
-        # Save the segment data as JSON
-        if self.status_bar:
-            with open(os.path.join(path, "segment_data.json"), "w") as f:
-                f.write(json.dumps(self.status_bar.segment_data))
-
-        # Pickle the statusbar object
-        if self.status_bar:
-            with open(os.path.join(path, "statusbar.pickle"), "wb") as f:
-                f.write(self.status_bar._Statusbar__pickle())
-
-        # Save the current command glyphs/settings as JSON
+        from ._CLI.plan import build_plan, write_plan
+        from ._CLI.glyphs import glyph_rules
+
         if self.current_command_max_depth < 1:
             self.current_command_max_depth = 1
-        with open(os.path.join(path, "command_settings.json"), "w") as f:
-            f.write(json.dumps({
-                "glyphs": self.current_command_glyphs,
-                "glyph": self.current_command_glyph,
-                "max_depth": self.current_command_max_depth,
-            }))
+        rules = glyph_rules(self.current_command_glyphs)
+        write_plan(build_plan(self.status_bar, {
+            "glyph_rules": rules,
+            "glyph": self.current_command_glyph,
+            "max_depth": self.current_command_max_depth,
+            "subscribe_context": self.subscribe_context,
+            "profile": self.status_bar is not None and self.status_bar.profile_segments,
+            "metrics": self.status_bar is not None and self.status_bar.record_metrics,
+        }))
+        return rules
+
+    def style(self):
+        """
+        Style tmux. Call at the end of your config file to style tmux.
+        """
+        from ._CLI.utils import user_segments_to_path
+        from ._CLI.glyphs import native_format
+
+        # User defined segments are imported when compiling the statusbar
+        user_segments_to_path()
+
+        # Save the statusbar and current command glyphs/settings as the render plan
+        rules = self.__write_plan()
 
         #  Pane border content to string
         if isinstance(self.pane_border_content, List):
@@ -176,25 +239,126 @@ class Styler:
             *self.status_bar._Statusbar__commands(),
 
             # Auto rename windows
-            f'tmux set -g automatic-rename {"on" if self.auto_rename_window else "off"}',
+            ["set", "-g", "automatic-rename", "on" if self.auto_rename_window else "off"],
             # Renumber windows
-            f'tmux set -g renumber-windows {"on" if self.renumber_windows else "off"}',
+            ["set", "-g", "renumber-windows", "on" if self.renumber_windows else "off"],
             # Auto rename format
-            f'tmux set -g automatic-rename-format "{self._auto_rename_window_content}"',
+            ["set", "-g", "automatic-rename-format", self._auto_rename_window_content],
 
             # Pane border
-            f'tmux set -g pane-border-status "{self.pane_border}"',
+            ["set", "-g", "pane-border-status", str(self.pane_border)],
             # Pane border style
-            f'tmux set -g pane-border-line "{self.pane_border_line_style}"',
+            ["set", "-g", "pane-border-line", str(self.pane_border_line_style)],
             # Pane border content
-            f'tmux set -g pane-border-format "{self.pane_border_content}"',
+            ["set", "-g", "pane-border-format", self.pane_border_content],
 
             # Term Colors
-            'tmux set -g default-terminal "screen-256color"',
+            ["set", "-g", "default-terminal", "screen-256color"],
+
+            # Render server, read by tmux-styler from the environment of its #() jobs
+            ["set-environment", "-g", "TMUX_STYLER_RENDER_SERVER",
+                "1" if self.render_server else "0"],
         ]
 
+        if self.current_command_mode == CurrentCommandMode.BATCH:
+            # Read the command from the pane option, updated by a job at the end of status-left
+            commands = [[arg.replace(str(ContextVar.PANE_CURRENT_COMMAND), "#{@styler_cmd}") for arg in command]
+                        for command in commands]
+            for command in commands:
+                if command[:3] == ["set", "-g", "status-left"]:
+                    command[3] += "#(tmux-styler -uc '#{session_id}')"
+        elif self.current_command_mode == CurrentCommandMode.NATIVE:
+            # tmux's current command, with the glyphs as format conditionals
+            native = "#{pane_current_command}"
+            if self.current_command_glyph:
+                native = native_format(rules, native)
+            commands = [[arg.replace(str(ContextVar.PANE_CURRENT_COMMAND), native) for arg in command]
+                        for command in commands]
+
+        # Saved for sourcing on the next tmux start, see main.tmux
+        from ._CLI.theme import write_theme
+        write_theme([*commands, self.__applied(commands)])
+
+        if self.apply_changes_only:
+            commands = self.__changed(commands)
+        if commands:
+            self.__run(commands)
+
+    @staticmethod
+    def __applied(commands: list[list[str]]) -> list[str]:
+        """
+        Returns the command storing the digest of the commands that aren't setting an option in `APPLIED_OPTION`.
+        """
+        import json
+        import hashlib
+
+        others = [command for command in commands
+                  if not (len(command) == 4 and command[:2] == ["set", "-g"])]
+        digest = hashlib.sha1(json.dumps(others).encode("utf-8")).hexdigest()
+        return ["set", "-g", APPLIED_OPTION, digest]
+
+    @staticmethod
+    def __changed(commands: list[list[str]]) -> list[list[str]]:
+        """
+        Returns the commands that change something, reading the current values of the options in a single tmux call.
+
+        Commands that aren't setting an option, e.g. hooks, can't be read back and are compared by their digest,
+        which is stored in the `APPLIED_OPTION` user option. If the current values can't be read reliably,
+        e.g. an option doesn't exist in the running tmux version, every command is returned.
+        """
+        import subprocess
+
+        options = [command for command in commands
+                   if len(command) == 4 and command[:2] == ["set", "-g"]]
+        others = [command for command in commands
+                  if not (len(command) == 4 and command[:2] == ["set", "-g"])]
+        applied = Styler.__applied(commands)
+        digest = applied[3]
+
+        # One line per option, unknown or unset options print nothing
+        argv = ["tmux"]
+        for name in [command[2] for command in options] + [APPLIED_OPTION]:
+            if len(argv) > 1:
+                argv.append(";")
+            argv += ["show", "-gqv", name]
+        proc = subprocess.run(argv, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True)
+        current = proc.stdout.split("\n")[:-1]
+        if proc.returncode != 0 or len(current) != len(options) + 1:
+            return commands + [applied]
+
+        changed = [command for command, value in zip(options, current)
+                   if command[3] != value]
+        if current[-1] != digest:
+            changed += others + [applied]
+        return changed
+
+    @staticmethod
+    def __run(commands: list[list[str]]):
+        """
+        Runs the tmux commands in a single tmux call. The arguments are passed to tmux as is, without
+        going through a shell or tmux's command parser.
+
+        tmux skips the rest of the commands after one fails, in that case the commands are run one
+        at a time so a single bad value only affects its own option.
+        """
+        import subprocess
+
+        # -q, options unknown to the running tmux version are ignored
+        commands = [[command[0], "-q", *command[1:]] if command[0] == "set" else command
+                    for command in commands]
+
+        def escape(arg: str) -> str:
+            # An argument ending with ";" would end the command
+            return arg[:-1] + "\\;" if arg.endswith(";") else arg
+
+        argv = ["tmux"]
+        for command in commands:
+            if len(argv) > 1:
+                argv.append(";")
+            argv.extend(map(escape, command))
+        if subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+            return
         for command in commands:
-            proc = subprocess.Popen(command, shell=True,
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            proc.wait()
-            proc.terminate()
+            subprocess.run(["tmux", *map(escape, command)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -0,0 +1,248 @@
+"""
+`tmux-styler bench`, measures the render cost of a config without a running tmux server.
+
+The config is run with `Styler.style()` capturing the Styler instead of applying it. Every function
+segment rendered by python is then called repeatedly with the context variables it declares taken
+from a captured or synthetic context. Segments inlined into tmux formats are rendered by tmux and
+cost nothing.
+
+For the cost of a redraw the render plan is written to a temporary directory and the
+`#(tmux-styler ...)` jobs of the compiled formats are rendered the way the render server does,
+concurrently and with the segments' deadlines and caches, answering the context from the same context.
+"""
+import os
+import re
+import time
+
+SYNTHETIC_CONTEXT = {
+    "session_name": "main",
+    "host": "buildhost.example.com",
+    "host_short": "buildhost",
+    "pane_index": "0",
+    "pane_id": "%0",
+    "pane_pid": "1",
+    "pane_current_command": "nvim",
+    "pane_current_path": "/home/user/projects/tmux-styler/src/tmux_styler/Statusbar",
+    "window_index": "1",
+    "window_name": "nvim",
+    "window_flags": "*",
+    "window_panes": "2",
+    "client_width": "200",
+}
+"""
+Context used when no context file is given.
+"""
+
+SYNTHETIC_WINDOWS = [
+    {"window_index": str(idx), "window_name": name,
+     "window_flags": "*" if idx == 1 else "", "window_active": "1" if idx == 1 else "0"}
+    for idx, name in enumerate(["zsh", "nvim", "git", "htop", "ssh"])
+]
+"""
+Windows used when no context file is given.
+"""
+
+
+def load_styler(config_path: str):
+    """
+    Runs the config and returns the Styler it styles, without applying anything to tmux.
+    """
+    import runpy
+    from ..Styler import Styler
+    from .utils import user_segments_to_path
+
+    user_segments_to_path()
+    stylers = []
+    style = Styler.style
+    Styler.style = lambda self: stylers.append(self)
+    try:
+        runpy.run_path(config_path, run_name="__main__")
+    finally:
+        Styler.style = style
+    if not stylers:
+        raise ValueError(f"{config_path} doesn't call Styler.style()")
+    return stylers[-1]
+
+
+def load_context(path: str | None) -> tuple[dict[str, str], list[dict[str, str]]]:
+    """
+    Returns the context and windows of a context file, `{"context": {...}, "windows": [{...}, ...]}`,
+    or the synthetic ones.
+    """
+    if path is None:
+        return SYNTHETIC_CONTEXT, SYNTHETIC_WINDOWS
+    import json
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("context", {}), data.get("windows") or [{}]
+
+
+def redraw_jobs(statusbar, context: dict[str, str],
+                windows: list[dict[str, str]]) -> list[tuple[dict[str, str], list[str]]]:
+    """
+    Returns the render requests tmux makes to redraw the statusbar, each with the context it is
+    rendered in: the `#(tmux-styler ...)` jobs of the sides and of the window format of every window.
+    """
+    import shlex
+    from .main import RENDER_FLAGS
+
+    options = {command[2]: command[3] for command in statusbar._Statusbar__commands()
+               if command[:2] == ["set", "-g"]}
+    active = next((idx for idx, window in enumerate(windows)
+                   if window.get("window_active", "1") == "1"), 0)
+    values = {**context, "window_start_flag": "1" if active == 0 else "0",
+              "window_end_flag": "1" if active == len(windows) - 1 else "0"}
+
+    formats = [(options["status-left"], values), (options["status-right"], values)]
+    for idx, window in enumerate(windows):
+        window_values = {
+            **context,
+            "window_start_flag": "1" if idx == 0 else "0",
+            "window_end_flag": "1" if idx == len(windows) - 1 else "0",
+            "window_active": "1" if idx == active else "0",
+            **window,
+        }
+        option = "window-status-current-format" if idx == active else "window-status-format"
+        formats.append((options[option], window_values))
+
+    jobs = []
+    for format, format_values in formats:
+        for command in re.findall(r"#\((tmux-styler [^)]*)\)", format):
+            command = re.sub(r"#\{(\w+)\}", lambda match: format_values.get(match[1], ""), command)
+            argv = shlex.split(command)
+            if len(argv) < 3 or argv[1] not in RENDER_FLAGS:
+                continue
+            # `-sl 1 -w 200` is requested as ["sl", "1", "200"]
+            jobs.append((format_values, [RENDER_FLAGS[argv[1]], argv[2], *argv[4:5]]))
+    return jobs
+
+
+def measure_redraw(styler, context: dict[str, str], windows: list[dict[str, str]],
+                   runs: int) -> tuple[list[float], int, int]:
+    """
+    Renders the jobs of a redraw runs times in-process, after a first redraw filling the caches, with
+    the plan and caches in a temporary directory. Returns the times in seconds, how many redraws
+    raised and the number of jobs of a redraw.
+    """
+    import shutil
+    import tempfile
+    from . import trace
+
+    directory = tempfile.mkdtemp()
+    environ = dict(os.environ)
+    try:
+        os.environ["XDG_CACHE_HOME"] = os.path.join(directory, "cache")
+        os.environ["XDG_RUNTIME_DIR"] = os.path.join(directory, "runtime")
+        os.environ.pop(trace.ENV, None)
+        styler._Styler__write_plan()
+        from . import process_segments
+        from .render import render
+        process_segments.reload_plan()
+
+        jobs = redraw_jobs(styler.status_bar, context, windows)
+
+        def redraw():
+            for values, job in jobs:
+                trace.replay_context(values)
+                render(job)
+
+        try:
+            redraw()
+        except Exception:
+            pass
+        times, errors = measure(redraw, runs)
+        trace.replay_context(None)
+        # Segments that missed their deadline are still writing to the cache
+        process_segments.wait_running(10)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(directory, ignore_errors=True)
+    return times, errors, len(jobs)
+
+
+def percentiles(times: list[float]) -> tuple[float, float, float]:
+    """
+    Returns the p50, p95 and p99 of the times.
+    """
+    times = sorted(times)
+    return tuple(times[min(len(times) - 1, int(quantile * len(times)))]
+                 for quantile in (0.5, 0.95, 0.99))
+
+
+def measure(call, runs: int) -> tuple[list[float], int]:
+    """
+    Calls call runs times, returns the times in seconds and how many calls raised.
+    """
+    times = []
+    errors = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            errors += 1
+        times.append(time.perf_counter() - start)
+    return times, errors
+
+
+def bench(config_path: str | None, context_path: str | None, runs: int, budget_ms: float) -> bool:
+    """
+    Prints the render cost of every python segment and of a redraw. Returns False if a segment is over budget.
+    """
+    from .utils import user_config_path
+    from ..Statusbar.Compiler import is_inlined, segment_function, segment_id, statusbar_segments
+    from ..Statusbar.Segment import SegmentType
+    from ..Statusbar.Segments import DEFAULT_SEGMENTS
+
+    config_path = config_path or user_config_path()
+    if config_path is None:
+        print("No config found, pass the path of a config")
+        return False
+    styler = load_styler(config_path)
+    statusbar = styler.status_bar
+    if statusbar is None:
+        print(f"{config_path} has no statusbar")
+        return False
+    context, windows = load_context(context_path)
+
+    print(f"{'segment':<8}{'function':<24}{'p50':>11}{'p95':>11}{'p99':>11}{'errors':>8}")
+    within_budget = True
+    seen = set()
+    for segment in statusbar_segments(statusbar):
+        id = segment_id(statusbar, segment)
+        # The window list can use the same segment for the active and inactive window
+        if segment.type == SegmentType.STRING or id in seen:
+            continue
+        seen.add(id)
+        if "." not in segment.content and segment.content not in DEFAULT_SEGMENTS:
+            print(f"{id:<8}{segment.content[:23]:<24}{'unknown segment, skipped':>41}")
+            continue
+        if is_inlined(statusbar, segment):
+            print(f"{id:<8}{segment.content[:23]:<24}{'inlined, rendered by tmux':>41}")
+            continue
+
+        function = segment_function(segment)
+        if function is None:
+            print(f"{id:<8}{segment.content[:23]:<24}{'can not be imported':>41}")
+            within_budget = False
+            continue
+        function, func = function
+        args = (statusbar.segment_data or {}).get(func) or {}
+        values = {var.value: context.get(var.value, "")
+                  for var in getattr(function, "context_vars", ())}
+        times, errors = measure(lambda: function(**args, **values), runs)
+        p50, p95, p99 = percentiles(times)
+        status = ""
+        if p95 * 1000 > budget_ms:
+            status = "  OVER BUDGET"
+            within_budget = False
+        print(f"{id:<8}{func[:23]:<24}{p50 * 1000:>8.2f} ms{p95 * 1000:>8.2f} ms"
+              f"{p99 * 1000:>8.2f} ms{errors:>8}{status}")
+
+    times, errors, jobs = measure_redraw(styler, context, windows, runs)
+    p50, p95, p99 = percentiles(times)
+    print(f"{'redraw':<32}{p50 * 1000:>8.2f} ms{p95 * 1000:>8.2f} ms{p99 * 1000:>8.2f} ms{errors:>8}"
+          f"  ({len(windows)} windows, {jobs} jobs)")
+    print(f"\nSegments are over budget when their p95 exceeds {budget_ms:g} ms")
+    return within_budget
@@ -0,0 +1,124 @@
+"""
+Segment content cache shared by every `tmux-styler` process of a user.
+
+Each entry is a file in the runtime directory named after the segment's cache key, with the
+modification time of the file being the time the content was rendered. Entries are replaced with
+a rename so readers never see a partially written entry and no locking is needed.
+
+Segments using context variables have an entry per value, e.g. every directory visited for `cwd`,
+only the `MAX_VALUES` most recently rendered values of a segment are kept.
+"""
+import os
+import time
+
+from .utils import runtime_dir
+
+MAX_VALUES = 32
+"""
+Entries kept per segment, for the values of its context variables.
+"""
+
+__memory: dict[str, tuple[float, str]] = {}
+"""
+Entries already read or written by this process, saves reading unchanged entries again in the render server.
+"""
+
+
+def cache_key(module: str, func: str, args: dict) -> str:
+    """
+    Returns the cache key of a segment function called with the given args.
+    """
+    import json
+    import hashlib
+    data = json.dumps([module, func, args], sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def __entry_path(key: str) -> str:
+    return os.path.join(runtime_dir(), "cache", key)
+
+
+def read(key: str) -> tuple[float, str] | None:
+    """
+    Returns the time the entry was written and its content, or None if there is no entry.
+    """
+    path = __entry_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            entry = __memory.get(key)
+            if entry is not None and entry[0] == mtime:
+                return entry
+            entry = (mtime, f.read())
+    except FileNotFoundError:
+        return None
+    __memory[key] = entry
+    return entry
+
+
+def get(key: str, ttl: float) -> str | None:
+    """
+    Returns the cached content if it is younger than ttl seconds.
+    """
+    entry = read(key)
+    if entry is None or time.time() - entry[0] >= ttl:
+        return None
+    return entry[1]
+
+
+def invalidate(key: str):
+    """
+    Removes the entries of a segment, including the entries of each value of its context variables.
+    """
+    directory = os.path.dirname(__entry_path(key))
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name == key or name.startswith(key + "-"):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def put(key: str, content: str):
+    """
+    Stores the content of a segment.
+    """
+    path = __entry_path(key)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    # Dated by the process's clock, which a replayed trace sets to the time of the recording
+    now = time.time()
+    os.utime(tmp_path, (now, now))
+    os.replace(tmp_path, path)
+    __memory[key] = (os.stat(path).st_mtime, content)
+    if "-" in key:
+        __evict(key.partition("-")[0])
+
+
+def __evict(prefix: str):
+    """
+    Removes the oldest entries of a segment over `MAX_VALUES`.
+    """
+    directory = os.path.dirname(__entry_path(prefix))
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.startswith(prefix + "-") and not entry.name.endswith(".tmp"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.name))
+            except FileNotFoundError:
+                pass
+    if len(entries) <= MAX_VALUES:
+        return
+    entries.sort()
+    for _, name in entries[:len(entries) - MAX_VALUES]:
+        __memory.pop(name, None)
+        try:
+            os.unlink(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
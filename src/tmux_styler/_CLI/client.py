@@ -0,0 +1,73 @@
+"""
+Thin client for the render server, see `server.py`.
+"""
+import os
+import sys
+import json
+import socket
+
+from .utils import runtime_dir, tmux_server_name
+
+TIMEOUT = 2
+"""
+Seconds to wait on the render server before falling back to rendering in-process.
+"""
+
+FORWARD_ENV = ["TMUX", "TMUX_PANE", "TMUX_STYLER_PROFILE", "TMUX_STYLER_TRACE", "TMUX_STYLER_METRICS"]
+"""
+Environment variables forwarded to the render server, tmux uses them to resolve the
+target of commands such as `display-message`, whether to profile the segments, whether
+to count the metrics and whether to record the renders.
+"""
+
+
+def socket_path() -> str:
+    """
+    Returns the path of the render server socket for the current tmux server.
+    """
+    return os.path.join(runtime_dir(), f"{tmux_server_name()}.sock")
+
+
+def start_server():
+    """
+    Starts a detached render server for the current tmux server.
+    """
+    import subprocess
+    subprocess.Popen([sys.executable, "-m", "tmux_styler._CLI.server", socket_path()],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+
+def request(args: list[str]) -> str | None:
+    """
+    Asks the render server to render the given CLI arguments.
+
+    Returns None when the server is disabled, not reachable or failed to render, in which case the
+    caller should render in-process. A server is started in the background if none is running.
+    """
+    if os.environ.get("TMUX_STYLER_RENDER_SERVER", "1") == "0":
+        return None
+
+    message = {
+        "args": args,
+        "env": {var: os.environ[var] for var in FORWARD_ENV if var in os.environ},
+    }
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(TIMEOUT)
+            sock.connect(socket_path())
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            chunks = []
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+    except (FileNotFoundError, ConnectionRefusedError):
+        start_server()
+        return None
+    except OSError:
+        return None
+
+    try:
+        response = json.loads(b"".join(chunks))
+    except ValueError:
+        return None
+    return response["output"] if response["ok"] else None
@@ -0,0 +1,248 @@
+"""
+Glyphs for the current command.
+
+The glyph rules are merged with the user's `current_command_glyphs` at `Styler.style()` time and
+stored in the render plan. Each process compiles them once into a `GlyphIndex`, so a lookup costs
+a dict lookup, a walk down a prefix trie and at most one regex match no matter how many rules there are.
+
+Rules are checked in this order: the user's process names, the command line rules (the user's, then
+the default ones), the default process names, then the process name prefixes.
+"""
+import re
+from typing import Callable, Dict
+
+DEFAULT_RULES = {
+    # Exact process names
+    "exact": {
+        # Shells
+        **{shell: "" for shell in ["sh", "zsh", "bash", "fish", "csh", "tcsh", "ksh", "dash"]},
+        # Editors
+        "vim": "",
+        "nvim": "",
+        "emacs": "",
+        # Language interpreters/runtimes/compilers
+        **{compiler: "/" for compiler in ["clang", "clang++", "gcc", "g++", "cc", "c++"]},
+        "node": "",
+        "nodejs": "",
+        "ruby": "",
+        "java": "",
+        "javac": "",
+        "rust": "",
+        "cargo": "",
+        "rustc": "",
+        "go": "",
+        # Tools
+        "gh": "",
+        "less": "󰗚",
+        "docker": "󰡨",
+        "rm": "",
+        "ssh": "󰷛",
+        "find": "",
+        "grep": "",
+        "terraform": "󱁢",
+    },
+    # Process name prefixes, the longest matching prefix wins
+    "prefix": {
+        "python": "",
+        "swift": "",
+        "git": "",
+    },
+    # Regular expressions on the full command line, the first matching rule wins
+    "command_line": [
+        [r"^\S*python\S*\s+(\S*/)?manage\.py\b", ""],
+    ],
+}
+"""
+Glyph rules included by default.
+"""
+
+BACKREFERENCE = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?P=|\(\?\()")
+"""
+Backreferences and conditionals on groups, which refer to other groups by their number or name
+and can't be merged with other patterns.
+"""
+
+
+NATIVE_ORDER = ["zsh", "bash", "fish", "sh", "nvim", "vim", "git", "ssh", "python", "node", "less",
+                "docker", "cargo", "go", "make", "gh", "emacs", "grep", "find", "rm"]
+"""
+Rules compiled into tmux formats are checked one after the other, the most common commands come first.
+"""
+
+
+def glyph_rules(glyphs: Dict[str, str] | None) -> dict:
+    """
+    Merges the user's glyphs into the default rules. A key ending with "*" is a prefix rule, a key
+    starting with "re:" a regular expression on the command line and any other key a process name.
+    User rules take precedence over the default rules.
+
+    Raises a `ValueError` if a regular expression is invalid.
+    """
+    rules = {
+        "exact": dict(DEFAULT_RULES["exact"]),
+        "user_exact": {},
+        "prefix": dict(DEFAULT_RULES["prefix"]),
+        "command_line": [],
+    }
+    for key, glyph in (glyphs or {}).items():
+        if key.startswith("re:"):
+            try:
+                re.compile(key[3:])
+            except re.error as e:
+                raise ValueError(f"Invalid regular expression in current_command_glyphs {key!r}: {e}")
+            rules["command_line"].append([key[3:], glyph])
+        elif key.endswith("*"):
+            rules["prefix"][key[:-1].lower()] = glyph
+        else:
+            rules["exact"][key.lower()] = glyph
+            rules["user_exact"][key.lower()] = glyph
+    rules["command_line"] += DEFAULT_RULES["command_line"]
+    return rules
+
+
+class GlyphIndex:
+    """
+    Glyph rules compiled for lookups. The user's process names are checked first, then command line
+    rules, then the other process names and process name prefixes.
+    """
+
+    def __init__(self, rules: dict):
+        self.exact: dict[str, str] = rules["exact"]
+        self.user_exact: dict[str, str] = rules.get("user_exact", {})
+
+        # Prefix trie, the glyph of a prefix is stored under the None key of its last character's node
+        self.trie: dict = {}
+        for prefix, glyph in rules["prefix"].items():
+            node = self.trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[None] = glyph
+
+        self.command_line_glyphs = [glyph for _, glyph in rules["command_line"]]
+        self.command_line = None
+        # Rules checked one after the other, if they can't be merged
+        self.command_line_rules: list[tuple[re.Pattern, str]] | None = None
+        patterns = [pattern for pattern, _ in rules["command_line"]]
+        if any(BACKREFERENCE.search(pattern) for pattern in patterns):
+            self.command_line_rules = [(re.compile(pattern), glyph)
+                                       for pattern, glyph in rules["command_line"]]
+        elif patterns:
+            # Every rule is a lookahead from the start of the command line, so the first
+            # rule that matches anywhere in it is the one that matches
+            try:
+                self.command_line = re.compile("|".join(
+                    f"(?=[\\s\\S]*?(?P<rule{idx}>(?:{pattern})))"
+                    for idx, pattern in enumerate(patterns)))
+            except re.error:
+                # e.g. the same group name in two rules or inline flags
+                self.command_line_rules = [(re.compile(pattern), glyph)
+                                           for pattern, glyph in rules["command_line"]]
+
+    def glyph(self, process_name: str, command_line: Callable[[], str] | None = None) -> str | None:
+        """
+        Returns the glyph of a process, or None. The command line is only fetched if there are command line rules.
+        """
+        name = process_name.lower()
+        glyph = self.user_exact.get(name)
+        if glyph is not None:
+            return glyph
+
+        if command_line is not None:
+            if self.command_line is not None:
+                match = self.command_line.match(command_line())
+                if match is not None:
+                    return self.command_line_glyphs[int(match.lastgroup[4:])]
+            elif self.command_line_rules is not None:
+                line = command_line()
+                for pattern, glyph in self.command_line_rules:
+                    if pattern.search(line) is not None:
+                        return glyph
+
+        glyph = self.exact.get(name)
+        if glyph is not None:
+            return glyph
+
+        node = self.trie
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                break
+            glyph = node.get(None, glyph)
+        return glyph
+
+    def glyphize(self, process_name: str, command_line: Callable[[], str] | None = None) -> str:
+        """
+        Returns the process name with its glyph.
+        """
+        glyph = self.glyph(process_name, command_line)
+        # Pad the glpyh with a space
+        glyph = f"{glyph} " if glyph else ""
+        return f"{glyph}{process_name}"
+
+
+def __escape(text: str) -> str:
+    """
+    Escapes text for use inside a tmux conditional.
+    """
+    return text.replace("#", "##").replace(",", "#,").replace("}", "#}")
+
+
+def native_format(rules: dict, command: str = "#{pane_current_command}") -> str:
+    """
+    Compiles the process name rules into a tmux format that prefixes the command with its glyph,
+    so tmux renders it without running python. Command line rules can't be expressed and are left out.
+
+    The rules become nested `#{?#{m/i:pattern,command},glyph ,...}` conditionals ordered by
+    `NATIVE_ORDER`. A rule that would shadow a more specific rule with a different glyph, e.g.
+    the "python" prefix and a "python3.11" name, is placed after it.
+    """
+    # (pattern, glyph, prefix)
+    entries = [(name, glyph, False) for name, glyph in rules["exact"].items()]
+    entries += [(prefix, glyph, True)
+                for prefix, glyph in rules["prefix"].items()]
+
+    def rank(entry):
+        name = entry[0]
+        for idx, common in enumerate(NATIVE_ORDER):
+            if name == common:
+                return idx
+        return len(NATIVE_ORDER)
+    entries.sort(key=rank)
+
+    ordered = []
+    emitted = set()
+
+    def emit(entry):
+        if entry in emitted:
+            return
+        emitted.add(entry)
+        name, glyph, prefix = entry
+        if prefix:
+            # More specific rules this prefix would shadow go first
+            for other in entries:
+                if other[0] != name and other[0].startswith(name) and other[1] != glyph:
+                    emit(other)
+        ordered.append(entry)
+
+    for entry in entries:
+        emit(entry)
+
+    # Each conditional falls through to the next rule, the last one to no glyph
+    format = ""
+    for name, glyph, prefix in reversed(ordered):
+        pattern = __escape(name.replace("[", "[[]")) + ("*" if prefix else "")
+        format = f"#{{?#{{m/i:{pattern},{command}}},{__escape(glyph)} ,{format}}}"
+    return format + command
+
+
+__index: tuple[dict, GlyphIndex] | None = None
+
+
+def glyph_index(settings: dict) -> GlyphIndex:
+    """
+    Returns the compiled glyph rules of the plan settings, compiled once per plan.
+    """
+    global __index
+    if __index is None or __index[0] is not settings:
+        __index = (settings, GlyphIndex(settings["glyph_rules"]))
+    return __index[1]
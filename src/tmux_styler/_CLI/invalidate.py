@@ -0,0 +1,27 @@
+"""
+Run by the tmux hooks installed when `Statusbar.refresh_mode` is `RefreshMode.EVENTS`.
+"""
+from . import cache
+from .plan import load_plan
+
+
+def invalidate(event: str):
+    """
+    Drops the cached content of the segments that depend on the event and has tmux redraw the statusbar
+    of every client.
+    """
+    import subprocess
+
+    for segment in load_plan().segments().values():
+        if event in segment["events"]:
+            cache.invalidate(segment["cache_key"])
+
+    # Without a target only the client tmux picks as the current one is refreshed
+    clients = subprocess.run(["tmux", "list-clients", "-F", "#{client_name}"],
+                             capture_output=True, text=True).stdout.splitlines()
+    if not clients:
+        return
+    command = ["tmux"]
+    for client in clients:
+        command += ["refresh-client", "-S", "-t", client, ";"]
+    subprocess.run(command[:-1], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
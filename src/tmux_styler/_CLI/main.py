@@ -1,15 +1,76 @@
 import os
-import argparse
-import subprocess
+import sys
 
-import inquirer
+# Flags tmux runs on every redraw, mapped to their render request
+RENDER_FLAGS = {
+    "-sl": "sl", "--seg-left": "sl",
+    "-sr": "sr", "--seg-right": "sr",
+    "-sw": "sw", "--seg-window": "sw",
+    "-sg": "sg", "--segment": "sg",
+    "-ppid": "ppid", "--pane-pid": "ppid",
+    "-uc": "uc", "--update-commands": "uc",
+}
 
-from .process_segments import process_left_right_segments, process_window_segments
-from .utils import dot_conf_path, dot_tmux_path, user_config_path
-from .process_name import process_name
+
+def __render(kind: str, *values: str):
+    """
+    Prints the output of a render request, from the render server if it is reachable.
+    """
+    from .client import request
+    output = request([kind, *values])
+    if output is not None:
+        print(output)
+        return
+
+    from .render import render
+    print(render([kind, *values], job=True), flush=True)
+    # Close stdout so tmux gets the output now, then let segments that missed their deadline
+    # finish, their content is the last good value of the next render
+    if "tmux_styler._CLI.process_segments" in sys.modules:
+        from .process_segments import wait_running
+        from .metrics import flush
+        sys.stdout.close()
+        wait_running(10)
+        # Counts of the segments that finished late
+        flush()
+
+
+def __fast_main(argv: list[str]) -> bool:
+    """
+    Handles the internal flags without argparse and without importing anything the mode doesn't need.
+    Returns False if the arguments should go through the full CLI instead.
+    """
+    if argv == ["--config-path"]:
+        from .utils import user_config_path
+        path = user_config_path()
+        print(path if path is not None else "")
+        return True
+
+    if len(argv) == 2 and argv[0] == "--invalidate":
+        from .invalidate import invalidate
+        invalidate(argv[1])
+        return True
+
+    # The sides can be given the width of the client, `-sl 1 -w 200`
+    width = []
+    if len(argv) == 4 and argv[0] in ("-sl", "-sr") and argv[2] in ("-w", "--width") and argv[3].isdigit():
+        width = [argv[3]]
+        argv = argv[:2]
+    if len(argv) != 2 or argv[0] not in RENDER_FLAGS:
+        return False
+    kind, value = RENDER_FLAGS[argv[0]], argv[1]
+    # Let argparse report invalid values
+    if kind not in ("sw", "sg", "uc") and not value.lstrip("-").isdigit():
+        return False
+    __render(kind, value, *width)
+    return True
 
 
 def main():
+    if __fast_main(sys.argv[1:]):
+        return
+
+    import argparse
     parser = argparse.ArgumentParser(
         description='Tmux Styler CLI tool')
 
@@ -18,12 +79,22 @@ def main():
                         nargs=1, help=argparse.SUPPRESS)
     parser.add_argument('-sr', '--seg-right', type=int,
                         nargs=1, help=argparse.SUPPRESS)
+    parser.add_argument('-w', '--width', type=int,
+                        nargs=1, help=argparse.SUPPRESS)
     parser.add_argument('-sw', '--seg-window', type=str,
                         nargs=1, help=argparse.SUPPRESS)
+    parser.add_argument('-sg', '--segment', type=str,
+                        nargs=1, help=argparse.SUPPRESS)
     parser.add_argument('-ppid', '--pane-pid', type=int,
                         nargs=1, help=argparse.SUPPRESS)
+    parser.add_argument('-uc', '--update-commands', type=str,
+                        nargs=1, help=argparse.SUPPRESS)
     parser.add_argument('--config-path', action='store_true',
                         help=argparse.SUPPRESS)
+    parser.add_argument('--invalidate', type=str,
+                        nargs=1, help=argparse.SUPPRESS)
+    parser.add_argument('--theme-current', action='store_true',
+                        help=argparse.SUPPRESS)
 
     # Public use
     parser.add_argument('-v', '--version', action='store_true',
@@ -32,22 +103,112 @@ def main():
                         help='tmux-styler will look in 2 directories for a config.py file, \
                          select the path to copy the default config to for customization')
 
+    commands = parser.add_subparsers(dest='command')
+    profile = commands.add_parser(
+        'profile', help='Summarizes the segment renders recorded with TMUX_STYLER_PROFILE=1 or Statusbar.profile_segments')
+    profile.add_argument('--clear', action='store_true',
+                         help='Removes the recorded segment renders')
+
+    stats = commands.add_parser(
+        'stats', help='Prints the render metrics enabled with TMUX_STYLER_METRICS=1 or Statusbar.record_metrics: segment render times, cache hits, job spawns and timeouts')
+    stats.add_argument('--prometheus', type=str, metavar='PATH',
+                       help='Writes the metrics in the Prometheus text format, e.g. for the node exporter textfile collector')
+    stats.add_argument('--reset', action='store_true',
+                       help='Zeroes the metrics')
+
+    bench = commands.add_parser(
+        'bench', help='Measures the render cost of every segment of a config, without a running tmux server')
+    bench.add_argument('config_file', type=str, nargs='?',
+                       help='Config to measure, defaults to your config')
+    bench.add_argument('--context', type=str, metavar='PATH',
+                       help='JSON file of the context values to render with, {"context": {...}, "windows": [{...}]}')
+    bench.add_argument('-n', '--runs', type=int, default=100,
+                       help='Renders of each segment, defaults to 100')
+    bench.add_argument('--budget', type=float, default=5, metavar='MS',
+                       help='Flags segments whose p95 exceeds this many milliseconds, defaults to 5')
+
+    trace = commands.add_parser(
+        'trace', help='Saves the renders recorded with TMUX_STYLER_TRACE=1 as a trace file for tmux-styler replay')
+    trace.add_argument('--save', type=str, metavar='PATH',
+                       help='Writes the recorded renders to a trace file and removes them')
+    trace.add_argument('--clear', action='store_true',
+                       help='Removes the recorded renders')
+
+    replay = commands.add_parser(
+        'replay', help='Replays a trace through the render path, printing the render times and a digest of the outputs')
+    replay.add_argument('trace_file', type=str,
+                        help='Trace saved with tmux-styler trace --save')
+    replay.add_argument('config_file', type=str, nargs='?',
+                        help='Config to render with, defaults to your config')
+    replay.add_argument('-n', '--runs', type=int, default=1,
+                        help='Times the trace is replayed, defaults to 1')
+    replay.add_argument('--output', type=str, metavar='PATH',
+                        help='Writes the output of every render as JSON lines, to diff against another commit')
+
     args = parser.parse_args()
 
+    if args.command == 'profile':
+        from . import profile
+        if args.clear:
+            profile.clear()
+        else:
+            print(profile.summary())
+        return
+    if args.command == 'bench':
+        from .bench import bench
+        sys.exit(0 if bench(args.config_file, args.context, args.runs, args.budget) else 1)
+    if args.command == 'trace':
+        from . import trace
+        if args.save:
+            count = trace.save(args.save)
+            trace.clear()
+            print(f"Saved {count} renders to {args.save}")
+        elif args.clear:
+            trace.clear()
+        else:
+            print(f"{len(trace.read())} renders recorded in {trace.log_path()}")
+        return
+    if args.command == 'replay':
+        from .replay import replay
+        sys.exit(0 if replay(args.trace_file, args.config_file, args.runs, args.output) else 1)
+    if args.command == 'stats':
+        from . import metrics
+        if args.reset:
+            metrics.reset()
+        elif args.prometheus:
+            metrics.write_prometheus(args.prometheus)
+        else:
+            print(metrics.summary())
+        return
+
+    width = [str(args.width[0])] if args.width else []
     if args.seg_left:
-        process_left_right_segments(True, bool(args.seg_left[0]))
+        __render("sl", str(args.seg_left[0]), *width)
         return
     if args.seg_right:
-        process_left_right_segments(False, bool(args.seg_right[0]))
+        __render("sr", str(args.seg_right[0]), *width)
         return
     if args.seg_window:
-        process_window_segments(
-            args.seg_window[0])
+        __render("sw", args.seg_window[0])
+        return
+    if args.segment:
+        __render("sg", args.segment[0])
         return
     if args.pane_pid:
-        print(process_name(args.pane_pid[0]))
+        __render("ppid", str(args.pane_pid[0]))
         return
+    if args.update_commands:
+        __render("uc", args.update_commands[0])
+        return
+    if args.invalidate:
+        from .invalidate import invalidate
+        invalidate(args.invalidate[0])
+        return
+    if args.theme_current:
+        from .theme import is_current
+        sys.exit(0 if is_current() else 1)
     if args.config_path:
+        from .utils import user_config_path
         path = user_config_path()
         print(path if path is not None else "")
         return
@@ -59,6 +220,10 @@ def main():
             data = toml.load(f)
             print(data["project"]["version"])
     if args.config:
+        import subprocess
+        import inquirer
+        from .utils import dot_conf_path, dot_tmux_path
+
         # Prompt the user to select a choice
         choices = [dot_conf_path(), dot_tmux_path()]
         from inquirer import List
@@ -0,0 +1,386 @@
+"""
+Render metrics shared by every `tmux-styler` process of a user, shown by `tmux-styler stats`.
+Enabled with `Statusbar.record_metrics` or by setting `TMUX_STYLER_METRICS=1` in tmux's global
+environment, renders don't count anything otherwise.
+
+Each process counts what happens while rendering in memory: the render time of every segment as a
+histogram, cache hits and misses of segments with a ttl, segments that missed their deadline or
+raised, renders and the jobs tmux spawned for them. The counts are added to a memory-mapped file in
+the runtime directory once per render, under a file lock, so a render only pays for a single small
+locked update no matter how many segments it has.
+
+Every render request tmux makes is a job, a `sh -c` running a `tmux-styler` client, so a spawn is
+counted per request the render server receives, or per render of a client that rendered in-process.
+Processes started by the segments themselves aren't counted.
+
+The file holds a header with the global counters, the job spawns of each of the last 60 minutes and
+a fixed number of segment slots, each keyed by the segment id and function.
+"""
+import os
+import mmap
+import time
+import fcntl
+import struct
+import threading
+
+from .utils import runtime_dir
+
+ENV = "TMUX_STYLER_METRICS"
+
+MAGIC = b"TSMT"
+VERSION = 2
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+"""
+Upper bounds in seconds of the render time histogram buckets, followed by a bucket for anything slower.
+"""
+
+HEADER = struct.Struct("<4sHHdQQQ")
+"""
+Magic, version, number of used segment slots, creation time, renders, job spawns and timeouts.
+"""
+
+MINUTE = struct.Struct("<qQ")
+"""
+Minute since the epoch and the job spawns during it.
+"""
+
+MINUTES = 60
+
+SLOT = struct.Struct("<15s32s" + "Q" * (len(BUCKETS) + 1) + "dQQQQ")
+"""
+Segment id, segment function, histogram bucket counts, total render time, cache hits, cache misses,
+timeouts and errors.
+"""
+
+SLOTS = 128
+
+SIZE = HEADER.size + MINUTE.size * MINUTES + SLOT.size * SLOTS
+
+__lock = threading.Lock()
+__pending: dict[tuple[str, str], list] = {}
+__renders = 0
+__spawns = 0
+__map: mmap.mmap | None = None
+__file = None
+__slots: dict[tuple[bytes, bytes], int] = {}
+
+
+def metrics_path() -> str:
+    """
+    Returns the path of the metrics file.
+    """
+    return os.path.join(runtime_dir(), "metrics")
+
+
+def enabled(settings: dict) -> bool:
+    """
+    Whether renders are counted, from the environment or the render plan settings.
+    """
+    return os.environ.get(ENV, "0") == "1" or settings.get("metrics", False)
+
+
+def __segment(segment_id: str, func: str) -> list:
+    """
+    Returns the pending counts of a segment, bucket counts followed by the time, hits, misses, timeouts and errors.
+    """
+    counts = __pending.get((segment_id, func))
+    if counts is None:
+        counts = __pending[(segment_id, func)] = [0] * (len(BUCKETS) + 1) + [0.0, 0, 0, 0, 0]
+    return counts
+
+
+def observe(segment_id: str, func: str, seconds: float, error: bool = False):
+    """
+    Counts a segment render that took the given time.
+    """
+    bucket = next((idx for idx, bound in enumerate(BUCKETS)
+                  if seconds <= bound), len(BUCKETS))
+    with __lock:
+        counts = __segment(segment_id, func)
+        counts[bucket] += 1
+        counts[len(BUCKETS) + 1] += seconds
+        if error:
+            counts[-1] += 1
+
+
+def cache_lookup(segment_id: str, func: str, hit: bool):
+    """
+    Counts a cache lookup of a segment with a ttl.
+    """
+    with __lock:
+        __segment(segment_id, func)[-4 if hit else -3] += 1
+
+
+def timeout(segment_id: str, func: str):
+    """
+    Counts a segment that missed its deadline.
+    """
+    with __lock:
+        __segment(segment_id, func)[-2] += 1
+
+
+def rendered(job: bool):
+    """
+    Counts a render, and the spawn of its job if tmux spawned one, then adds the pending counts
+    to the metrics file.
+    """
+    global __renders, __spawns
+    with __lock:
+        __renders += 1
+        if job:
+            __spawns += 1
+    flush()
+
+
+def __initialize(file):
+    """
+    Zeroes the metrics file, the caller holds the lock.
+    """
+    file.truncate(0)
+    file.truncate(SIZE)
+    file.seek(0)
+    file.write(HEADER.pack(MAGIC, VERSION, 0, time.time(), 0, 0, 0))
+    file.flush()
+
+
+def __open() -> mmap.mmap:
+    """
+    Maps the metrics file, creating or resetting it if it isn't a metrics file of this version.
+    """
+    global __map, __file
+    if __map is not None:
+        return __map
+    path = metrics_path()
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    file = os.fdopen(fd, "r+b")
+    fcntl.flock(file, fcntl.LOCK_EX)
+    try:
+        header = file.read(HEADER.size)
+        if len(header) != HEADER.size or HEADER.unpack(header)[:2] != (MAGIC, VERSION) or \
+                os.fstat(fd).st_size != SIZE:
+            __initialize(file)
+    finally:
+        fcntl.flock(file, fcntl.LOCK_UN)
+    __file, __map = file, mmap.mmap(fd, SIZE)
+    return __map
+
+
+def __slot(map: mmap.mmap, key: tuple[bytes, bytes], used: int) -> int | None:
+    """
+    Returns the index of the slot of a segment, None if it has no slot and there's no free slot left.
+    """
+    idx = __slots.get(key)
+    if idx is not None and idx < used and \
+            SLOT.unpack_from(map, HEADER.size + MINUTE.size * MINUTES + idx * SLOT.size)[:2] == key:
+        return idx
+    for idx in range(used):
+        if SLOT.unpack_from(map, HEADER.size + MINUTE.size * MINUTES + idx * SLOT.size)[:2] == key:
+            __slots[key] = idx
+            return idx
+    if used == SLOTS:
+        return None
+    SLOT.pack_into(map, HEADER.size + MINUTE.size * MINUTES + used * SLOT.size,
+                   *key, *[0] * (len(BUCKETS) + 1), 0.0, 0, 0, 0, 0)
+    __slots[key] = used
+    return used
+
+
+def flush():
+    """
+    Adds the counts of this process to the metrics file.
+    """
+    global __pending, __renders, __spawns
+    with __lock:
+        pending, renders, spawns = __pending, __renders, __spawns
+        __pending, __renders, __spawns = {}, 0, 0
+    if not pending and not renders and not spawns:
+        return
+
+    try:
+        map = __open()
+    except OSError:
+        return
+    fcntl.flock(__file, fcntl.LOCK_EX)
+    try:
+        magic, version, used, created, total_renders, total_spawns, total_timeouts = HEADER.unpack_from(map)
+        timeouts = 0
+        for (segment_id, func), counts in pending.items():
+            key = (segment_id.encode("utf-8")[:15].ljust(15, b"\0"),
+                   func.encode("utf-8")[:32].ljust(32, b"\0"))
+            idx = __slot(map, key, used)
+            if idx is None:
+                continue
+            used = max(used, idx + 1)
+            offset = HEADER.size + MINUTE.size * MINUTES + idx * SLOT.size
+            current = SLOT.unpack_from(map, offset)
+            SLOT.pack_into(map, offset, *key, *[value + delta for value, delta in
+                                                zip(current[2:], counts)])
+            timeouts += counts[-2]
+
+        # Spawns of the current minute, replacing the count of the same minute an hour ago
+        minute = int(time.time() // 60)
+        offset = HEADER.size + (minute % MINUTES) * MINUTE.size
+        stored_minute, count = MINUTE.unpack_from(map, offset)
+        MINUTE.pack_into(map, offset, minute,
+                         (count if stored_minute == minute else 0) + spawns)
+
+        HEADER.pack_into(map, 0, magic, version, used, created, total_renders + renders,
+                         total_spawns + spawns, total_timeouts + timeouts)
+    finally:
+        fcntl.flock(__file, fcntl.LOCK_UN)
+
+
+def read() -> dict | None:
+    """
+    Returns the metrics, or None if nothing was recorded yet.
+    """
+    try:
+        with open(metrics_path(), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) != SIZE or HEADER.unpack_from(data)[:2] != (MAGIC, VERSION):
+        return None
+    _, _, used, created, renders, spawns, timeouts = HEADER.unpack_from(data)
+    minutes = dict(MINUTE.unpack_from(data, HEADER.size + idx * MINUTE.size)
+                   for idx in range(MINUTES))
+    segments = []
+    for idx in range(used):
+        values = SLOT.unpack_from(
+            data, HEADER.size + MINUTE.size * MINUTES + idx * SLOT.size)
+        buckets = list(values[2:3 + len(BUCKETS)])
+        segments.append({
+            "id": values[0].rstrip(b"\0").decode("utf-8", "replace"),
+            "func": values[1].rstrip(b"\0").decode("utf-8", "replace"),
+            "buckets": buckets,
+            "count": sum(buckets),
+            "sum": values[3 + len(BUCKETS)],
+            "hits": values[4 + len(BUCKETS)],
+            "misses": values[5 + len(BUCKETS)],
+            "timeouts": values[6 + len(BUCKETS)],
+            "errors": values[7 + len(BUCKETS)],
+        })
+    return {"created": created, "renders": renders, "spawns": spawns, "timeouts": timeouts,
+            "minutes": minutes, "segments": segments}
+
+
+def reset():
+    """
+    Zeroes the metrics, in place as other processes keep the file mapped.
+    """
+    fd = os.open(metrics_path(), os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+b") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            __initialize(file)
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def __quantile(buckets: list[int], quantile: float) -> float | None:
+    """
+    Returns the upper bound of the bucket a quantile falls in, None for the overflow bucket.
+    """
+    rank = quantile * sum(buckets)
+    seen = 0
+    for idx, count in enumerate(buckets):
+        seen += count
+        if seen >= rank and count:
+            return BUCKETS[idx] if idx < len(BUCKETS) else None
+    return None
+
+
+def summary() -> str:
+    """
+    Returns the metrics as a table.
+    """
+    metrics = read()
+    if metrics is None:
+        return "No renders recorded yet"
+
+    # The current minute and the 59 before it, or as many as there are since the metrics were created
+    minute = int(time.time() // 60)
+    last_hour = [metrics["minutes"].get(minute - idx, 0) for idx in range(MINUTES)]
+    age = max(1, min(MINUTES, minute - int(metrics["created"] // 60) + 1))
+
+    def bound(seconds: float | None) -> str:
+        return f"<{seconds * 1000:g} ms" if seconds is not None else f">{BUCKETS[-1]:g} s"
+
+    lines = [
+        f"renders              {metrics['renders']}",
+        f"job spawns           {metrics['spawns']}, {last_hour[0]} this minute, "
+        f"{sum(last_hour) / age:.1f}/min over the last hour",
+        f"timeouts             {metrics['timeouts']}",
+        "",
+        f"{'segment':<8}{'function':<24}{'renders':>8}{'mean':>10}{'p50':>11}{'p99':>11}"
+        f"{'cache hit':>11}{'timeouts':>10}{'errors':>8}",
+    ]
+    for segment in sorted(metrics["segments"], key=lambda segment: segment["sum"], reverse=True):
+        lookups = segment["hits"] + segment["misses"]
+        mean = segment["sum"] / segment["count"] * 1000 if segment["count"] else 0
+        hit_ratio = f"{segment['hits'] / lookups:.0%}" if lookups else "-"
+        lines.append(f"{segment['id']:<8}{segment['func'][:23]:<24}{segment['count']:>8}{mean:>7.2f} ms"
+                     f"{bound(__quantile(segment['buckets'], 0.5)):>11}"
+                     f"{bound(__quantile(segment['buckets'], 0.99)):>11}"
+                     f"{hit_ratio:>11}{segment['timeouts']:>10}{segment['errors']:>8}")
+    return "\n".join(lines)
+
+
+def __escape(value: str) -> str:
+    """
+    Escapes a label value for the exposition format.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus() -> str:
+    """
+    Returns the metrics in the Prometheus text exposition format.
+    """
+    metrics = read() or {"renders": 0, "spawns": 0, "segments": []}
+
+    def labels(segment: dict, **extra) -> str:
+        pairs = {"segment": segment["id"], "function": segment["func"], **extra}
+        return ",".join(f'{name}="{__escape(value)}"' for name, value in pairs.items())
+
+    lines = [
+        "# HELP tmux_styler_renders_total Statusbar and current command renders.",
+        "# TYPE tmux_styler_renders_total counter",
+        f"tmux_styler_renders_total {metrics['renders']}",
+        "# HELP tmux_styler_job_spawns_total Render jobs spawned by tmux.",
+        "# TYPE tmux_styler_job_spawns_total counter",
+        f"tmux_styler_job_spawns_total {metrics['spawns']}",
+        "# HELP tmux_styler_segment_duration_seconds Render time of function segments.",
+        "# TYPE tmux_styler_segment_duration_seconds histogram",
+    ]
+    for segment in metrics["segments"]:
+        cumulative = 0
+        for bound, count in zip([*map(str, BUCKETS), "+Inf"], segment["buckets"]):
+            cumulative += count
+            lines.append(
+                f"tmux_styler_segment_duration_seconds_bucket{{{labels(segment, le=bound)}}} {cumulative}")
+        lines.append(
+            f"tmux_styler_segment_duration_seconds_sum{{{labels(segment)}}} {segment['sum']}")
+        lines.append(
+            f"tmux_styler_segment_duration_seconds_count{{{labels(segment)}}} {segment['count']}")
+    for name, field, help in (("cache_hits", "hits", "Segment cache lookups that found content younger than the ttl."),
+                              ("cache_misses", "misses", "Segment cache lookups that didn't."),
+                              ("timeouts", "timeouts", "Segments that missed their deadline."),
+                              ("errors", "errors", "Segments that raised.")):
+        lines.append(f"# HELP tmux_styler_segment_{name}_total {help}")
+        lines.append(f"# TYPE tmux_styler_segment_{name}_total counter")
+        for segment in metrics["segments"]:
+            lines.append(
+                f"tmux_styler_segment_{name}_total{{{labels(segment)}}} {segment[field]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """
+    Writes the metrics for the node exporter's textfile collector, replacing the file with a rename.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus())
+    os.replace(tmp_path, path)
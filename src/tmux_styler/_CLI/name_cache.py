@@ -0,0 +1,87 @@
+"""
+Current command cache shared by every `tmux-styler -ppid` process of a user.
+
+An entry maps a pane, its root process pid and start time so a reused pid isn't mistaken for the
+pane, to the process that was found running in it and the name displayed for it. The entry is
+used as long as that process is still the one running: the pane's foreground process group, or
+where that isn't available the pane's children, is unchanged and the process hasn't exited or
+exec'd another program.
+
+The entries are kept in a single small file in the runtime directory, one tab separated entry per
+line, oldest first, replaced with a rename on every change. Changes are made under an exclusive
+`flock` of a lock file next to it, so processes storing entries at the same time don't drop each
+other's entries. Only the newest `MAX_ENTRIES` are kept.
+"""
+import os
+import fcntl
+
+from .utils import runtime_dir
+
+MAX_ENTRIES = 256
+
+__entries: dict[str, list[str]] | None = None
+__mtime: float | None = None
+
+
+def __path() -> str:
+    return os.path.join(runtime_dir(), "process_names")
+
+
+def __load() -> dict[str, list[str]]:
+    """
+    Returns the entries, only reading the file again if it changed.
+    """
+    global __entries, __mtime
+    path = __path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        __entries, __mtime = {}, None
+        return __entries
+    if __entries is None or mtime != __mtime:
+        entries = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 6:
+                    entries[fields[0]] = fields[1:]
+        __entries, __mtime = entries, mtime
+    return __entries
+
+
+def get(key: str, signature: str, generation: int) -> tuple[int, str, str] | None:
+    """
+    Returns the pid and identity (see `process_name.process_identity`) of the process found
+    running in the pane and its displayed name, if the pane's signature and the render plan generation are unchanged.
+    """
+    entry = __load().get(key)
+    if entry is None or entry[0] != signature or entry[1] != str(generation):
+        return None
+    return int(entry[2]), entry[3], entry[4]
+
+
+def put(key: str, signature: str, generation: int, pid: int, identity: str, name: str):
+    """
+    Stores the process found running in the pane, evicting the oldest entries over `MAX_ENTRIES`.
+    """
+    global __entries, __mtime
+    path = __path()
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Read again under the lock, another process may have stored entries since
+            entries = dict(__load())
+            entries.pop(key, None)
+            entries[key] = [signature, str(generation), str(pid), identity,
+                            name.replace("\t", " ").replace("\n", " ")]
+            while len(entries) > MAX_ENTRIES:
+                del entries[next(iter(entries))]
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join("\t".join([key, *entry]) + "\n"
+                                for key, entry in entries.items()))
+            os.replace(tmp_path, path)
+            __entries, __mtime = entries, os.stat(path).st_mtime_ns
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,67 @@
+"""
+Current command of every pane at once, for `CurrentCommandMode.BATCH`.
+
+Instead of a `#(tmux-styler -ppid #{pane_pid})` job per pane and redraw, a single job in the
+statusbar resolves the command of every pane of every session and publishes them as the
+`@styler_cmd` pane option, which the formats read. Every session is covered so the window names and
+pane borders of sessions without a client of their own are kept up to date too. The command is the foreground process group
+leader of the pane's terminal, where that isn't available a single snapshot of the process table is
+taken and walked for every pane.
+"""
+import subprocess
+from collections import defaultdict
+
+from .plan import load_plan
+from .process_name import command_name, foreground_group, foreground_pid, proc_name
+
+OPTION = "@styler_cmd"
+
+
+def process_table() -> tuple[dict[int, list[int]], dict[int, str]]:
+    """
+    Returns the children of every process and the name of every process, from a single pass over the process table.
+    """
+    import psutil
+
+    children: dict[int, list[int]] = defaultdict(list)
+    names: dict[int, str] = {}
+    for process in psutil.process_iter(["ppid", "name"]):
+        names[process.pid] = process.info["name"] or ""
+        if process.info["ppid"] is not None:
+            children[process.info["ppid"]].append(process.pid)
+    return children, names
+
+
+def update_pane_commands() -> str:
+    """
+    Sets `@styler_cmd` of every pane of the server whose command changed. Returns nothing to display.
+    """
+    settings = load_plan().settings()
+    panes = subprocess.run(["tmux", "list-panes", "-a", "-F", f"#{{pane_id}}\t#{{pane_pid}}\t#{{{OPTION}}}"],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    table = None
+
+    # One tmux call for every changed pane
+    command = ["tmux"]
+    for line in panes.splitlines():
+        pane_id, pane_pid, current = line.split("\t", 2)
+        name = None
+        pid = foreground_group(int(pane_pid))
+        if pid is not None:
+            name = proc_name(pid)
+        if name is None:
+            if table is None:
+                table = process_table()
+            children, names = table
+            pid = foreground_pid(int(pane_pid), lambda pid: children.get(pid, []),
+                                 settings["max_depth"])
+            name = names.get(pid, "")
+        name = command_name(name, settings, pid)
+        if name != current:
+            if len(command) > 1:
+                command.append(";")
+            command += ["set-option", "-p", "-t", pane_id, OPTION, name]
+    if len(command) > 1:
+        subprocess.run(command, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+    return ""
@@ -0,0 +1,229 @@
+"""
+Render plan, the precomputed statusbar written by `Styler.style()` and read on every redraw.
+
+The plan is a single versioned file that is memory-mapped by readers. Each entry is stored as
+UTF-8 at an offset given by a fixed size table, so a reader only decodes the entries it uses.
+Side and window entries are templates: literal tmux format text with the ids of the segments that
+have to be rendered by python in between, separated by NUL characters. The segment table and the
+current command settings are JSON entries.
+
+A new plan is written next to the old one and swapped in with a rename, so a reader racing a
+`Styler.style()` call always sees either the old or the new generation in full.
+"""
+import os
+import mmap
+import struct
+
+from .utils import cache_dir
+
+MAGIC = b"TSRP"
+VERSION = 2
+
+HEADER = struct.Struct("<4sHHQI")
+"""
+Magic, version, reserved, generation and number of entries.
+"""
+
+ENTRY = struct.Struct("<II")
+"""
+Offset and length of an entry.
+"""
+
+ENTRIES = ("sl0", "sl1", "sr0", "sr1", "swa", "swi", "segments", "settings", "layouts")
+"""
+Entries in the order they are stored. "sl1" is the left side when the active window is first,
+"sr1" the right side when the active window is last, "swa"/"swi" the active/inactive window.
+"layouts" holds the layout of the sides that drop segments to fit the client, by side.
+"""
+
+SLOT = "\x00"
+
+
+def plan_path() -> str:
+    """
+    Returns the path of the render plan.
+    """
+    return os.path.join(cache_dir(), "render.plan")
+
+
+class RenderPlan:
+    """
+    Memory-mapped, read-only view of a render plan.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.generation, count = HEADER.unpack_from(
+            self.__map)
+        if magic != MAGIC or version != VERSION or count != len(ENTRIES):
+            raise ValueError(
+                f"{path} is not a version {VERSION} render plan, re-apply your config")
+        self.__offsets = {
+            name: ENTRY.unpack_from(self.__map, HEADER.size + idx * ENTRY.size)
+            for idx, name in enumerate(ENTRIES)
+        }
+        self.__json = {}
+
+    def entry(self, name: str) -> str:
+        """
+        Returns the decoded entry.
+        """
+        offset, length = self.__offsets[name]
+        return self.__map[offset:offset + length].decode("utf-8")
+
+    def template(self, name: str) -> list[str]:
+        """
+        Returns a side or window template, even items are tmux format text and odd items segment ids.
+        """
+        return self.entry(name).split(SLOT)
+
+    def __load_json(self, name: str):
+        if name not in self.__json:
+            import json
+            self.__json[name] = json.loads(self.entry(name))
+        return self.__json[name]
+
+    def segments(self) -> dict:
+        """
+        Returns the segment table, segment id to the module, function, args, context variables, style and caching of the segment.
+        """
+        return self.__load_json("segments")
+
+    def settings(self) -> dict:
+        """
+        Returns the current command settings.
+        """
+        return self.__load_json("settings")
+
+    def layout(self, name: str) -> dict | None:
+        """
+        Returns the layout of a side that drops segments to fit the client, see `side_layout`, or None.
+        """
+        return self.__load_json("layouts").get(name)
+
+    def is_current(self) -> bool:
+        """
+        Whether this is still the plan at `plan_path()`, False once a new generation was swapped in.
+        """
+        try:
+            stat = os.stat(plan_path())
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) == (self.stat.st_ino, self.stat.st_mtime_ns)
+
+
+def load_plan() -> RenderPlan:
+    """
+    Opens the current render plan.
+    """
+    return RenderPlan(plan_path())
+
+
+def __segment_entry(segment) -> dict:
+    """
+    Returns the segment table entry of a function segment.
+    """
+    from ..Statusbar.Segments import DEFAULT_SEGMENTS
+    from ..Statusbar.Render import style_content
+    from ..Statusbar.Compiler import segment_function
+
+    if "." in segment.content:
+        module, func = segment.content.split(".")
+    else:
+        module = f"tmux_styler.Statusbar.Segments.{DEFAULT_SEGMENTS[segment.content]}"
+        func = segment.content
+    prefix, suffix = style_content(segment, SLOT).split(SLOT)
+    # Context variables declared by the segment, resolved for all segments at once when rendering
+    function = segment_function(segment)
+    context = getattr(function[0], "context_vars", ()) if function is not None else ()
+    return {"module": module, "func": func, "prefix": prefix, "suffix": suffix,
+            "context": [var.value for var in context]}
+
+
+def build_plan(statusbar, settings: dict) -> dict[str, str]:
+    """
+    Builds the plan entries for a Statusbar, or None for no statusbar, and the current command settings.
+    """
+    import json
+    from ..Statusbar.Segments import DEFAULT_SEGMENTS
+    from ..Statusbar.Statusbar import RefreshMode
+    from ..Statusbar.Compiler import (compiles_side, job_content, segment_id, segment_refresh,
+                                      truncates_side)
+    from ..Statusbar.Render import side_format, side_layout, window_format
+    from .cache import cache_key
+
+    segments = {}
+
+    def slot(segment):
+        # String segments and segments with a tmux format tmux expands in the output are rendered as is
+        content = job_content(statusbar, segment)
+        if content is not None:
+            return content
+        # Unknown included segments are skipped
+        if "." not in segment.content and segment.content not in DEFAULT_SEGMENTS:
+            return None
+        id = segment_id(statusbar, segment)
+        entry = __segment_entry(segment)
+        segment_data = statusbar.segment_data or {}
+        entry["args"] = segment_data.get(entry["func"]) or {}
+        entry["ttl"] = segment.ttl
+        entry["events"], interval = segment_refresh(segment)
+        # With events the content is kept until one of its events or its interval passes
+        if statusbar.refresh_mode == RefreshMode.EVENTS:
+            entry["ttl"] = interval if interval else float("inf")
+        entry["timeout"] = segment.timeout if segment.timeout is not None else statusbar.segment_timeout
+        entry["cache_key"] = cache_key(
+            entry["module"], entry["func"], entry["args"])
+        segments[id] = entry
+        return SLOT + id + SLOT
+
+    entries = {name: "" for name in ENTRIES}
+    entries["settings"] = json.dumps(settings)
+    entries["layouts"] = "{}"
+    if statusbar is None:
+        entries["segments"] = json.dumps(segments)
+        return entries
+
+    layouts = {}
+    for side in ("l", "r"):
+        for flag in (0, 1):
+            entries[f"s{side}{flag}"] = side_format(
+                statusbar, side == "l", bool(flag), slot)
+            if truncates_side(statusbar, side == "l") and not compiles_side(statusbar, side == "l"):
+                layouts[f"s{side}{flag}"] = side_layout(
+                    statusbar, side == "l", bool(flag), slot)
+    entries["layouts"] = json.dumps(layouts)
+    entries["swa"] = window_format(statusbar, "active", slot)
+    entries["swi"] = window_format(statusbar, "inactive", slot)
+    entries["segments"] = json.dumps(segments)
+    return entries
+
+
+def write_plan(entries: dict[str, str]):
+    """
+    Writes the plan entries as a new generation and atomically swaps it in.
+    """
+    path = plan_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        generation = RenderPlan(path).generation + 1
+    except (OSError, ValueError):
+        generation = 1
+
+    blobs = [entries[name].encode("utf-8") for name in ENTRIES]
+    offset = HEADER.size + ENTRY.size * len(ENTRIES)
+    table = []
+    for blob in blobs:
+        table.append(ENTRY.pack(offset, len(blob)))
+        offset += len(blob)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, generation, len(ENTRIES)))
+        f.write(b"".join(table))
+        f.write(b"".join(blobs))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
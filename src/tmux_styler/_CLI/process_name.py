@@ -1,104 +1,220 @@
 import os
-from typing import Dict
-import psutil
-import json
-
-from .utils import get_user_data_path
-
-
-def glyphize(process_name: str, glyphs: Dict[str, str]) -> str:
-    """ Glyphs for common processes """
-    process_name_lower = process_name.lower()
-    SHELLS = ["sh", "zsh", "bash", "fish", "csh", "tcsh", "ksh", "dash"]
-
-    glyph: str | None = None
-    # Check if the process name is in the user provided glyphs dictionary
-    if glyphs and process_name_lower in glyphs:
-        glyph = glyphs[process_name_lower]
-
-    # SHELLS
-    elif process_name_lower in SHELLS:
-        glyph = ""
-
-    # Editors
-    elif process_name_lower == "vim" or process_name_lower == "nvim":
-        glyph = ""
-    elif process_name_lower == "emacs":
-        glyph = ""
-
-    # Language interpreters/runtimes/compilers
-    elif process_name_lower in ["clang", "clang++", "gcc", "g++", "cc", "c++"]:
-        glyph = "/"
-    elif process_name_lower.startswith("python"):
-        glyph = ""
-    elif process_name_lower == "node" or process_name_lower == "nodejs":
-        glyph = ""
-    elif process_name_lower == "ruby":
-        glyph = ""
-    elif process_name_lower == "java" or process_name_lower == "javac":
-        glyph = ""
-    elif process_name_lower in ["rust", "cargo", "rustc"]:
-        glyph = ""
-    elif process_name_lower.startswith("swift"):
-        glyph = ""
-    elif process_name_lower == "go":
-        glyph = ""
-
-    # === Tools ===
-    # Git
-    elif process_name_lower == "gh" or process_name_lower.startswith("git"):
-        glyph = ""
-    # Less pager
-    elif process_name_lower == "less":
-        glyph = "󰗚"
-    # Docker
-    elif process_name_lower == "docker":
-        glyph = "󰡨"
-    # rm
-    elif process_name_lower == "rm":
-        glyph = ""
-    # SSH
-    elif process_name_lower == "ssh":
-        glyph = "󰷛"
-    # Find and Grep
-    elif process_name_lower == "find" or process_name_lower == "grep":
-        glyph = ""
-    # Terraform
-    elif process_name_lower == "terraform":
-        glyph = "󱁢"
-
-    # Pad the glpyh with a space
-    glyph = f"{glyph} " if glyph else ""
-    return f"{glyph}{process_name}"
+from typing import Callable
 
+from . import trace
+from .plan import load_plan
+from .glyphs import glyph_index
+
+PROC = "/proc"
+"""
+Where the process table is read from, psutil is used where it isn't available. Benchmarks point it
+at a synthetic process tree.
+"""
+
+
+def proc_read(pid: int, name: str) -> bytes | None:
+    """
+    Returns the content of /proc/<pid>/<name>, or None where /proc isn't available or the process doesn't exist.
+    """
+    try:
+        with open(f"{PROC}/{pid}/{name}", "rb") as f:
+            content = f.read()
+    except OSError:
+        content = None
+    trace.record_proc(pid, name, content)
+    return content
+
+
+def proc_stat(pid: int) -> list[bytes] | None:
+    """
+    Returns the fields of /proc/<pid>/stat after the command name, starting with the state.
+    None where /proc isn't available or the process doesn't exist.
+    """
+    stat = proc_read(pid, "stat")
+    if stat is None:
+        return None
+    # The command name may contain spaces and parentheses
+    return stat[stat.rfind(b")") + 2:].split()
+
+
+def proc_cmdline(pid: int) -> str | None:
+    """
+    Returns the command line of a process, or None if the process doesn't exist.
+    """
+    cmdline = proc_read(pid, "cmdline")
+    if cmdline is not None:
+        return cmdline.rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+    import psutil
+    try:
+        return " ".join(psutil.Process(pid).cmdline())
+    except psutil.Error:
+        return None
+
+
+def proc_name(pid: int) -> str | None:
+    """
+    Returns the name of a process, or None if the process doesn't exist.
+    """
+    comm = proc_read(pid, "comm")
+    if comm is None:
+        import psutil
+        try:
+            return psutil.Process(pid).name()
+        except psutil.Error:
+            return None
+    name = comm.decode("utf-8", "replace").removesuffix("\n")
+    # The kernel truncates names to 15 characters, like psutil take the full name from the command line
+    if len(name) >= 15:
+        line = proc_cmdline(pid)
+        if line:
+            full_name = os.path.basename(line.split(" ")[0])
+            if full_name.startswith(name):
+                return full_name
+    return name
+
+
+def proc_children(pid: int) -> list[int]:
+    """
+    Returns the pids of the children of a process, from a pass over the process table.
+    """
+    try:
+        entries = os.listdir(PROC)
+    except OSError:
+        import psutil
+        try:
+            return [child.pid for child in psutil.Process(pid).children()]
+        except psutil.Error:
+            return []
+    trace.record_listing(entries)
+    ppid = str(pid).encode()
+    pids = []
+    for entry in entries:
+        if entry.isdigit():
+            fields = proc_stat(int(entry))
+            if fields is not None and len(fields) > 1 and fields[1] == ppid:
+                pids.append(int(entry))
+    return pids
+
+
+def foreground_group(pane_pid: int) -> int | None:
+    """
+    Returns the foreground process group of the pane's terminal, the pid of the group's leader,
+    from the tpgid field of /proc/<pane_pid>/stat. None where /proc isn't available.
+    """
+    fields = proc_stat(pane_pid)
+    # state, ppid, pgrp, session, tty_nr and tpgid
+    try:
+        tpgid = int(fields[5])
+    except (TypeError, IndexError, ValueError):
+        return None
+    return tpgid if tpgid > 0 else None
 
-def process_name(pane_id: int) -> str:
-    """ Get the name of the process running in the pane """
-    # Get the path to the command_settings.json file
-    path = get_user_data_path()
-    # Load the settings
-    with open(os.path.join(path, "command_settings.json"), "r") as f:
-        settings = json.load(f)
-    max_depth = settings["max_depth"]
 
-    # Get the process
-    process = psutil.Process(pane_id)
+def start_time(pid: int) -> str | None:
+    """
+    Returns the start time of a process, tells a process apart from a later one with the same pid.
+    """
+    fields = proc_stat(pid)
+    if fields is not None and len(fields) > 19:
+        return fields[19].decode()
+    import psutil
+    try:
+        return str(psutil.Process(pid).create_time())
+    except psutil.Error:
+        return None
 
+
+def process_identity(pid: int) -> str | None:
+    """
+    Returns the start time and name of a process, tells a process apart from a later one with the
+    same pid and from the program it exec'd, which keeps its pid and start time.
+    """
+    stat = proc_read(pid, "stat")
+    if stat is not None:
+        fields = stat[stat.rfind(b")") + 2:].split()
+        if len(fields) > 19:
+            comm = stat[stat.find(b"(") + 1:stat.rfind(b")")].decode("utf-8", "replace")
+            return f"{fields[19].decode()} {comm}".replace("\t", " ").replace("\n", " ")
+    import psutil
+    try:
+        process = psutil.Process(pid)
+        return f"{process.create_time()} {process.name()}".replace("\t", " ").replace("\n", " ")
+    except psutil.Error:
+        return None
+
+
+def foreground_pid(pane_pid: int, children: Callable[[int], list[int]], max_depth: int) -> int:
+    """
+    Returns the pid of the process considered to be running in the pane, following the pane's
+    root process down its only child at most max_depth times.
+    """
+    pid = pane_pid
     for _ in range(max_depth):
-        num_children = len(process.children())
+        pid_children = children(pid)
         # May seem odd that a process with more than 1 child is considered a leaf,
         # but this is because you probably actually want the the lowest "root" process.
         # ex. neovim with a bunch of plugins will probably have several child processes
         # that are all children of the neovim process, these would be things like the lsp
         # server, linter, etc. but you probably only care about the neovim process.
-        if num_children == 0 or num_children > 1:
+        if len(pid_children) != 1:
             break
-        else:
-            process = process.children()[0]
+        pid = pid_children[0]
+    return pid
+
 
-    name = process.name()
+def command_name(name: str, settings: dict, pid: int | None = None) -> str:
+    """
+    Returns the process name as displayed, with its glyph if enabled.
+    The command line of the process is only read if there are glyph rules for command lines.
+    """
     if settings["glyph"]:
-        glyphs = settings["glyphs"]
-        return glyphize(name, glyphs)
+        def full_command_line() -> str:
+            line = proc_cmdline(pid)
+            return line if line is not None else name
+        return glyph_index(settings).glyphize(name, full_command_line if pid is not None else None)
     else:
         return name
+
+
+def process_name(pane_id: int) -> str:
+    """ Get the name of the process running in the pane """
+    from . import name_cache
+
+    plan = load_plan()
+
+    # The pane is unchanged while its foreground process group, or where that isn't available its
+    # children, are the same, then the process found running in it is too if it hasn't exited or
+    # exec'd another program, e.g. a shell running `exec vim`
+    pane_start = start_time(pane_id)
+    signature = foreground_group(pane_id)
+    if signature is None:
+        signature = ",".join(map(str, proc_children(pane_id)))
+    key = f"{pane_id}:{pane_start}"
+    signature = str(signature)
+
+    cached = name_cache.get(key, signature, plan.generation)
+    if cached is not None:
+        pid, identity, name = cached
+        if process_identity(pid) == identity:
+            return name
+
+    pid, name = __resolve(pane_id, plan.settings())
+    identity = process_identity(pid)
+    if pane_start is not None and identity is not None:
+        name_cache.put(key, signature, plan.generation, pid, identity, name)
+    return name
+
+
+def __resolve(pane_id: int, settings: dict) -> tuple[int, str]:
+    """
+    Returns the pid of the process running in the pane and its displayed name.
+    """
+    # The foreground process group leader is what is running in the pane
+    pid = foreground_group(pane_id)
+    if pid is not None:
+        pid_name = proc_name(pid)
+        if pid_name is not None:
+            return pid, command_name(pid_name, settings, pid)
+
+    pid = foreground_pid(pane_id, proc_children, settings["max_depth"])
+    return pid, command_name(proc_name(pid) or "", settings, pid)
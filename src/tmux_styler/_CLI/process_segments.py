@@ -1,254 +1,287 @@
-import os
-import pickle
+import time
 import importlib
-import importlib.util
+import threading
 
-from ..Statusbar.Statusbar import SegmentSeparator, Statusbar, Segment
-from ..Statusbar.WindowList import *
-from ..Statusbar.Segments import DEFAULT_SEGMENTS
-from .utils import get_user_data_path, user_segments_to_path
+from . import cache, metrics, profile, trace
+from .plan import SLOT, RenderPlan, load_plan
+from .utils import user_segments_to_path
 
+plan: RenderPlan = load_plan()
 
-def __get_default_segment_module(segment):
-    """Path to the included Segments directory"""
-    return f".Statusbar.Segments.{DEFAULT_SEGMENTS[segment]}"
+__running: dict[str, threading.Thread] = {}
+"""
+Segment evaluations by cache key, kept while running so a segment that missed its deadline
+isn't started again by the next render of the render server.
+"""
 
+__late = threading.Lock()
+"""
+Orders a segment finishing against its render giving up on it, see `__run_segment`.
+"""
 
-def __depickle_statusbar() -> Statusbar:
-    """
-    Reads the pickled Statusbar object and returns it.
-    """
-    path = get_user_data_path()
-    with open(os.path.join(path, "statusbar.pickle"), "rb") as f:
-        return pickle.load(f)
+LAST_GOOD_MAX = 256
+"""
+Last good contents kept in memory, the least recently rendered are dropped first.
+"""
+
+__last_good: dict[str, str] = {}
+"""
+Last good content of the segments rendered by this process, by cache key. Only segments with a
+ttl or that missed their deadline are also stored in the cache shared with other processes.
+"""
 
 
-statusbar = __depickle_statusbar()
+__widths: dict[str, int] = {}
+"""
+Width of the content last rendered for the segments of sides that drop segments to fit the client,
+by segment id, the estimate of their width before they are rendered again.
+"""
 
 
-def __get_segment_content(segment: Segment) -> str | None:
+def reload_plan():
     """
-    Returns the content of the segment.
+    Reloads the render plan and drops what was kept for the previous one, used by the render
+    server after the config is re-applied and before every run of a replay.
     """
-    # TODO: Proper error handling/logging
+    global plan
+    plan = load_plan()
+    __widths.clear()
+    __last_good.clear()
 
-    # String segment
-    if segment.type == SegmentType.STRING:
-        return " " + segment.content + " "
 
-    # Function segment
-    try:
-        # User defined segments
-        if "." in segment.content:
-            module, func = segment.content.split(".")
-            module = importlib.import_module(module)
-
-        # Default/Included segments
-        else:
-            # Skip when the segment is not a default segment
-            if segment.content not in DEFAULT_SEGMENTS:
-                return None
-
-            # Import the module from .Statusbar.Segments.{module name}
-            module = importlib.import_module(
-                __get_default_segment_module(segment.content), package="tmux_styler")
-            func = segment.content
-
-        # Get the args
-        args = {}
-        if statusbar.segment_data is not None and func in statusbar.segment_data:
-            args = statusbar.segment_data[func]
-
-        # Execute the function
-        content = getattr(module, func)(**args)
-        # Handle the content
-        if isinstance(content, list):
-            content = "".join(map(str, content))
-        else:
-            content = str(content)
-
-        if segment.style is not None:
-            content = f"#[{segment.style.apply()}] {content} #[default]"
-        else:
-            content = f" {content} "
-        return content
-    except Exception as e:
-        return str(e)
+def __resolve_context(segments: list[dict]) -> dict[str, str]:
+    """
+    Resolves the context variables declared by the segments with a single call to tmux, or from
+    the trace being replayed.
+    """
+    from ..ContextVars import ContextVar, current_values
+
+    names = sorted({name for segment in segments for name in segment["context"]})
+    if not names:
+        return {}
+    values = trace.replayed_context(names)
+    if values is None:
+        values = dict(zip(names, current_values([ContextVar(name) for name in names])))
+    trace.record_context(values)
+    return values
 
 
-def __get_separator(segment: Segment, next_segment: Segment | None, left_side: bool) -> str:
+def __call_segment(segment: dict, context: dict[str, str]) -> str:
     """
-    Returns the proper separator + formatting for between the segments.
+    Executes the segment's function and returns its content.
     """
+    module = importlib.import_module(segment["module"])
+    # Execute the function, passing the declared context variables
+    content = getattr(module, segment["func"])(**segment["args"], **context)
+    # Handle the content
+    if isinstance(content, list):
+        return "".join(map(str, content))
+    return str(content)
 
-    # If the next segment is the last segment on that side
-    if next_segment is None:
-        end = statusbar.left_end_separator if left_side else statusbar.right_end_separator
-        separator_str = end.right_thick if left_side else end.left_thick
-        return f'#[bg=default,fg={segment.bg}]' + separator_str if left_side else f'#[bg=default,fg={segment.bg}]' + separator_str
 
-    # If the user has a separator defined
-    if segment.separator is not None:
-        separator_str = segment.separator
-        return f'#[bg={next_segment.bg},fg={segment.bg}]' + separator_str if left_side else f'#[bg={next_segment.bg},fg={segment.bg}]' + separator_str
-
-    separator = statusbar.segment_separator
-    # Segments with same bg color use a thin separator
-    if str(segment.bg) == str(next_segment.bg):
-        separator_str = separator.right_thin if left_side else separator.left_thin
-        return f'#[bg={segment.bg},fg={segment.fg}]' + separator_str if left_side else f'#[bg={segment.bg},fg={segment.fg}]' + separator_str
+def __run_segment(segment_id: str, segment: dict, key: str, context: dict[str, str]):
+    """
+    Thread target, renders a segment and keeps the content as the segment's last good value.
+    The content is only written to the shared cache if it has a ttl or the render gave up on it,
+    so the next render, of this process or another, gets it as last good value.
+    """
+    thread = threading.current_thread()
+    start = time.perf_counter()
+    # TODO: Proper error handling/logging
+    try:
+        content = __call_segment(segment, context)
+    except Exception as e:
+        thread.content = str(e)
+        thread.error = True
     else:
-        separator_str = separator.right_thick if left_side else separator.left_thick
-        return f'#[bg={next_segment.bg},fg={segment.bg}]' + separator_str if left_side else f'#[bg={next_segment.bg},fg={segment.bg}]' + separator_str
+        thread.content = content
+        thread.error = False
+        __last_good.pop(key, None)
+        __last_good[key] = content
+        while len(__last_good) > LAST_GOOD_MAX:
+            del __last_good[next(iter(__last_good))]
+    with __late:
+        thread.done = True
+        late = thread.late
+    if not thread.error and (segment["ttl"] or late):
+        cache.put(key, thread.content)
+    if thread.counting:
+        metrics.observe(segment_id, segment["func"],
+                        time.perf_counter() - start, thread.error)
+
+
+def __profile_segment(segment_id: str, segment: dict, key: str, context: dict[str, str]):
+    """
+    Thread target used instead of `__run_segment` when profiling, records the render of the segment.
+    """
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        importlib.import_module(segment["module"])
+    except Exception:
+        pass
+    import_time = time.perf_counter() - start
+    __run_segment(segment_id, segment, key, context)
+    profile.record(segment_id, segment["func"], time.perf_counter() - start,
+                   time.thread_time() - cpu_start, import_time, threading.current_thread().error)
 
 
-def __seg_if(if_: str, then: str, else_: str):
+def __get_segment_contents(segment_ids: list[str]) -> dict[str, str]:
+    """
+    Returns the content of the segments, rendering them concurrently.
+    A segment that misses its deadline gets its last good content, or nothing if it never rendered.
+    """
+    segments = plan.segments()
+    start = time.monotonic()
+    contents: dict[str, str] = {}
+    threads: dict[str, tuple[str, threading.Thread]] = {}
+    values = __resolve_context([segments[id] for id in segment_ids])
+    profiling = profile.enabled(plan.settings())
+    counting = metrics.enabled(plan.settings())
+
+    for segment_id in segment_ids:
+        segment = segments[segment_id]
+        key = segment["cache_key"]
+        context = {name: values[name] for name in segment["context"]}
+        # The content of segments using context variables depends on their values,
+        # the segment's key is kept as prefix so invalidating the segment covers every value
+        if context:
+            key += "-" + cache.cache_key(segment["module"],
+                                         segment["func"], context)
+        if segment["ttl"]:
+            content = cache.get(key, segment["ttl"])
+            if counting:
+                metrics.cache_lookup(segment_id, segment["func"], content is not None)
+            if content is not None:
+                contents[segment_id] = content
+                continue
+
+        thread = __running.get(key)
+        if thread is None or not thread.is_alive():
+            if profiling:
+                thread = threading.Thread(target=__profile_segment,
+                                          args=(segment_id, segment, key, context), daemon=True)
+            else:
+                thread = threading.Thread(target=__run_segment,
+                                          args=(segment_id, segment, key, context), daemon=True)
+            thread.content = None
+            thread.done = thread.late = False
+            thread.counting = counting
+            thread.start()
+            __running[key] = thread
+        threads[segment_id] = (key, thread)
+
+    for segment_id, (key, thread) in threads.items():
+        segment = segments[segment_id]
+        thread.join(max(0, start + segment["timeout"] - time.monotonic()))
+        with __late:
+            missed = not thread.done
+            thread.late |= missed
+        if not missed:
+            thread.join()
+            __running.pop(key, None)
+            contents[segment_id] = thread.content
+            continue
+        # Missed the deadline, fall back to the last good content
+        if counting:
+            metrics.timeout(segment_id, segment["func"])
+        content = __last_good.get(key)
+        if content is None:
+            entry = cache.read(key)
+            content = entry[1] if entry is not None else ""
+        contents[segment_id] = content
+
+    return {
+        segment_id: segments[segment_id]["prefix"] + content + segments[segment_id]["suffix"]
+        for segment_id, content in contents.items()
+    }
+
+
+def wait_running(timeout: float):
     """
-    if statement in the form of tmux format string.
+    Waits up to timeout seconds for segments that missed their deadline, so their content
+    is stored as the last good value for the next render.
     """
-    return f"#{{?{if_},{then},{else_}}}"
+    deadline = time.monotonic() + timeout
+    for thread in list(__running.values()):
+        thread.join(max(0, deadline - time.monotonic()))
 
 
-def process_left_right_segments(left_side: bool, active_flag: bool):
+def __render_template(name: str) -> str:
     """
-    Processes the segments passed in from the CLI.
-
-    :param left_side: Whether the segments are on the left side or not.
-    :param active_flag: Whether the active window is first, for the left side, or last, for the right side.
+    Renders a template from the plan, filling in the content of its segments.
     """
     # Add user defined segments to sys.path
     user_segments_to_path()
 
-    # Get the segments from the Statusbar object
-    segments = statusbar.left_side if left_side else statusbar.right_side
-    if isinstance(segments, tuple):
-        segments = segments[0]
-
-    format = []
-    length = len(segments)
-    # Iterate over each segment
-    for idx, segment in enumerate(segments):
-        # Get the content of the segment, skip if empty
-        content = __get_segment_content(segment)
-        if content == None:
-            continue
-
-        if left_side:
-            next_segment: Segment | None = segments[idx +
-                                                    1] if idx < length - 1 else None
-            # If the window list is on the left side, than the next segment will actually be the first segment part of the window list
-            if statusbar.window_list.alignment == WindowListAlignment.LEFT and next_segment is None:
-                # If the active window is the first window
-                if active_flag:
-                    next_segment = statusbar.window_list.active
-                else:
-                    next_segment = statusbar.window_list.inactive
-
-            # Get the separator
-            separator = __get_separator(
-                segment, next_segment, left_side)
-
-            # Build the segment
-            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
-            format.append(content)
-            format.append(f"{separator}")
-
-        else:
-            next_segment: Segment | None = segments[idx -
-                                                    1] if idx > 0 else None
-            # If the window list is on the right side, than the first segment in the right side's next segment is part of the window list
-            if statusbar.window_list.alignment == WindowListAlignment.RIGHT and next_segment is None:
-                # If the active window is the last window
-                if active_flag:
-                    next_segment = statusbar.window_list.active
-                else:
-                    next_segment = statusbar.window_list.inactive
-
-            separator = __get_separator(
-                segment, next_segment, left_side)
-
-            # Build the segment
-            format.append(f"{separator}")
-            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
-            format.append(content)
-
-    # Print segment to stdout
-    print("".join(format))
-
-
-def process_window_segments(which: str):
-    active_segment = statusbar.window_list.active
-    inactive_segment = statusbar.window_list.inactive
-    # Get the segment from the Statusbar object
-    if which == "active":
-        segment = active_segment
-    else:
-        segment = inactive_segment
+    parts = plan.template(name)
+    contents = __get_segment_contents(parts[1::2])
+    for idx in range(1, len(parts), 2):
+        parts[idx] = contents[parts[idx]]
+    return "".join(parts)
 
-    # Get the content of the segment
-    content = __get_segment_content(segment)
 
-    # Build the segment
-    format = []
+def __render_layout(layout: dict, client_width: int) -> str:
+    """
+    Renders a side that drops segments to fit the client, only the segments displayed are rendered.
+    """
+    from ..Statusbar.Render import assemble_side, fit_side
+    from ..Statusbar.Width import format_width
 
-    alignment = statusbar.window_list.alignment
+    # Add user defined segments to sys.path
+    user_segments_to_path()
 
-    # The separator for each window in the list needs some additional logic
-    # which we'll implement using tmux format stings to be fast rather than
-    # using python logic
-    is_last = "#{window_end_flag}"
-    is_first = "#{window_start_flag}"
-    is_one_less_than_active = "#{==:#I,#{e|-:#{active_window_index},1}}"
-    is_one_more_than_active = "#{==:#I,#{e|+:#{active_window_index},1}}"
+    measure = lambda format: format_width(format, {})
+
+    def estimate(segment_id: str) -> int:
+        # The width it was last rendered with, by this process or any other if its content is cached
+        width = __widths.get(segment_id)
+        if width is None:
+            segment = plan.segments()[segment_id]
+            entry = cache.read(segment["cache_key"]) if not segment["context"] else None
+            if entry is None:
+                return 0
+            width = __widths[segment_id] = measure(segment["prefix"] + entry[1] + segment["suffix"])
+        return width
+
+    # Variables tmux expands in the output aren't known, segments are counted with at least their min_width
+    displayed, contents = fit_side(layout, client_width, __get_segment_contents, measure, estimate)
+    for segment_id, content in contents.items():
+        __widths[segment_id] = measure(content)
+    parts = assemble_side(layout, displayed).split(SLOT)
+    for idx in range(1, len(parts), 2):
+        parts[idx] = contents[parts[idx]]
+    return "".join(parts)
+
+
+def process_left_right_segments(left_side: bool, active_flag: bool, client_width: int | None = None) -> str:
+    """
+    Processes the segments passed in from the CLI and returns the tmux format string.
 
-    separator: SegmentSeparator = statusbar.segment_separator
-    match alignment:
-        case WindowListAlignment.LEFT:
-            end_separator: SegmentSeparator = statusbar.left_end_separator
+    :param left_side: Whether the segments are on the left side or not.
+    :param active_flag: Whether the active window is first, for the left side, or last, for the right side.
+    :param client_width: Width of the client, segments with a priority are dropped to fit it.
+    """
+    name = f"s{'l' if left_side else 'r'}{int(active_flag)}"
+    if client_width is not None:
+        layout = plan.layout(name)
+        if layout is not None:
+            return __render_layout(layout, client_width)
+    return __render_template(name)
 
-            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
-            format.append(content)
-            format.append(f"#[fg={segment.bg},bg=default]")
 
-            if which == "active":
-                format.append(
-                    __seg_if(is_last, f'#[fg={active_segment.bg}]' + end_separator.right_thick, f'#[fg={active_segment.bg},bg={inactive_segment.bg}]' + separator.right_thick))
-            else:
-                when_last = f'#[fg={inactive_segment.bg}]' + \
-                    end_separator.right_thick
-                when_not_last = f'#[fg={inactive_segment.fg},bg={inactive_segment.bg}]' + \
-                    separator.right_thin
+def process_window_segments(which: str) -> str:
+    """
+    Processes the active or inactive window segment and returns the tmux format string.
+    """
+    return __render_template("swa" if which == "active" else "swi")
 
-                format.append(
-                    __seg_if(is_last, when_last, __seg_if(is_one_less_than_active, f'#[bg={active_segment.bg}]' + separator.right_thick, when_not_last)))
 
-        case WindowListAlignment.RIGHT:
-            end_separator: SegmentSeparator = statusbar.right_end_separator
+def process_segment(segment_id: str) -> str:
+    """
+    Returns the content of a single segment, used by the compiled formats for segments that
+    can't be expressed as a tmux format.
+    """
+    # Add user defined segments to sys.path
+    user_segments_to_path()
 
-            if which == "active":
-                format.append(
-                    __seg_if(is_first, f'#[fg={active_segment.bg}]' + end_separator.left_thick, f'#[fg={active_segment.bg},bg={inactive_segment.bg}]' + separator.left_thick))
-            else:
-                format.append(f"#[fg={inactive_segment.bg}]")
-                when_first = end_separator.left_thick
-                when_not_first = f'#[fg={inactive_segment.fg},bg={inactive_segment.bg}]' + \
-                    separator.left_thin
-
-                format.append(
-                    __seg_if(is_first, when_first, __seg_if(is_one_more_than_active, f'#[bg={active_segment.bg}]' + separator.left_thick, when_not_first)))
-
-            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
-            format.append(content)
-
-        case _:
-            # TODO: More elegant solution for the center alignments?
-            format.append(f"#[fg={segment.fg},bg={segment.bg}]")
-            if segment.style is not None:
-                format.append(f"#[{segment.style.apply()}]")
-            format.append(content)
-            format.append("#[default]")
-            format.append(
-                __seg_if(is_last, "", f"#[fg={active_segment.fg},bg={active_segment.bg}] "))
-
-    # Print segment to stdout
-    print("".join(format))
+    return __get_segment_contents([segment_id])[segment_id]
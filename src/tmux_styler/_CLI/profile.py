@@ -0,0 +1,109 @@
+"""
+Per-segment profiling of the render path, enabled with `Statusbar.profile_segments` or by setting
+`TMUX_STYLER_PROFILE=1` in tmux's global environment.
+
+Every render of a function segment appends a fixed size record to `profile.log` in the runtime
+directory: when it was rendered, its wall time, its CPU time, the time spent importing its module
+and whether it raised. Records are small enough to be appended with a single write, so every
+`tmux-styler` process and the render server can append to the log without locking.
+`tmux-styler profile` summarizes the log.
+"""
+import os
+import struct
+
+from .utils import runtime_dir
+
+ENV = "TMUX_STYLER_PROFILE"
+
+RECORD = struct.Struct("<dfffB15s32s")
+"""
+Time of the render, wall time, CPU time and import time in seconds, whether the segment raised,
+the segment id and the segment function.
+"""
+
+
+def log_path() -> str:
+    """
+    Returns the path of the profile log.
+    """
+    return os.path.join(runtime_dir(), "profile.log")
+
+
+def enabled(settings: dict) -> bool:
+    """
+    Whether segment renders are recorded, from the environment or the render plan settings.
+    """
+    return os.environ.get(ENV, "0") == "1" or settings.get("profile", False)
+
+
+def record(segment_id: str, func: str, wall: float, cpu: float, import_time: float, error: bool):
+    """
+    Appends the record of a segment render to the log.
+    """
+    import time
+    data = RECORD.pack(time.time(), wall, cpu, import_time, error,
+                       segment_id.encode("utf-8")[:15], func.encode("utf-8")[:32])
+    fd = os.open(log_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def read() -> list[tuple]:
+    """
+    Returns the records of the log, oldest first, a partially written record at the end is skipped.
+    """
+    try:
+        with open(log_path(), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    count = len(data) // RECORD.size
+    return [RECORD.unpack_from(data, idx * RECORD.size) for idx in range(count)]
+
+
+def clear():
+    """
+    Removes the log.
+    """
+    try:
+        os.unlink(log_path())
+    except FileNotFoundError:
+        pass
+
+
+def summary() -> str:
+    """
+    Returns a table of the recorded segments, ranked by the total time spent rendering them.
+    """
+    import math
+    import statistics
+
+    segments: dict[tuple[str, str], list[tuple]] = {}
+    for _, wall, cpu, import_time, error, segment_id, func in read():
+        key = (segment_id.rstrip(b"\0").decode("utf-8", "replace"),
+               func.rstrip(b"\0").decode("utf-8", "replace"))
+        segments.setdefault(key, []).append((wall, cpu, import_time, error))
+    if not segments:
+        return f"No segment renders recorded, set {ENV}=1 or Statusbar.profile_segments to record them"
+
+    rows = []
+    for (segment_id, func), records in segments.items():
+        walls = sorted(record[0] for record in records)
+        rows.append((
+            sum(walls), segment_id, func, len(records),
+            statistics.median(walls), walls[math.ceil(0.95 * (len(walls) - 1))],
+            statistics.mean(record[1] for record in records),
+            sum(record[2] for record in records),
+            sum(record[3] for record in records),
+        ))
+    rows.sort(reverse=True)
+
+    lines = [f"{'segment':<8}{'function':<24}{'renders':>8}{'total':>11}{'p50':>10}{'p95':>10}"
+             f"{'cpu':>10}{'import':>10}{'errors':>8}"]
+    for total, segment_id, func, count, p50, p95, cpu, import_time, errors in rows:
+        lines.append(f"{segment_id:<8}{func[:23]:<24}{count:>8}{total * 1000:>8.1f} ms"
+                     f"{p50 * 1000:>7.2f} ms{p95 * 1000:>7.2f} ms{cpu * 1000:>7.2f} ms"
+                     f"{import_time * 1000:>7.1f} ms{errors:>8}")
+    return "\n".join(lines)
@@ -0,0 +1,66 @@
+"""
+Renders the output of the internal CLI flags tmux runs on every redraw.
+Shared by the CLI fast path and the render server.
+"""
+
+__plan = None
+"""
+Render plan the metrics setting is read from, opened again once a new generation is swapped in.
+"""
+
+
+def __settings() -> dict:
+    """
+    Returns the current command settings of the current render plan.
+    """
+    global __plan
+    if __plan is None or not __plan.is_current():
+        from .plan import load_plan
+        __plan = load_plan()
+    return __plan.settings()
+
+
+def render(args: list[str], job: bool = False) -> str:
+    """
+    Renders the output for the given internal CLI arguments, e.g. `["sl", "1"]` for `-sl 1` or
+    `["sl", "1", "200"]` for `-sl 1 -w 200`, counts the render in the metrics when enabled and
+    records it when tracing. job is whether the request comes from a job tmux spawned.
+    """
+    from . import metrics, trace
+    # Updating the pane commands changes tmux, it can't be replayed
+    recording = trace.enabled() and args[0] != "uc"
+    if recording:
+        trace.begin(args)
+    output = __render(args)
+    if recording:
+        trace.end(output)
+    if metrics.enabled(__settings()):
+        metrics.rendered(job)
+    return output
+
+
+def __render(args: list[str]) -> str:
+    """
+    Renders the output for the given internal CLI arguments. Only imports what the requested mode needs.
+    """
+    match args:
+        case ["sl" | "sr" as side, active_flag]:
+            from .process_segments import process_left_right_segments
+            return process_left_right_segments(side == "sl", bool(int(active_flag)))
+        case ["sl" | "sr" as side, active_flag, client_width]:
+            from .process_segments import process_left_right_segments
+            return process_left_right_segments(side == "sl", bool(int(active_flag)), int(client_width))
+        case ["sw", which]:
+            from .process_segments import process_window_segments
+            return process_window_segments(which)
+        case ["sg", segment_id]:
+            from .process_segments import process_segment
+            return process_segment(segment_id)
+        case ["ppid", pane_pid]:
+            from .process_name import process_name
+            return process_name(int(pane_pid))
+        case ["uc", _]:
+            # The panes of every session are updated, whichever session's statusbar runs the job
+            from .pane_commands import update_pane_commands
+            return update_pane_commands()
+    raise ValueError(f"Unknown render request: {args}")
@@ -0,0 +1,153 @@
+"""
+`tmux-styler replay`, feeds a trace recorded with `TMUX_STYLER_TRACE=1` (see trace.py) back through
+the render path, so the render cost and output of two commits can be compared on identical input.
+
+The config is run without applying anything to tmux and its render plan is written to a temporary
+directory, along with a fresh segment cache. Before every event the context variables are answered
+from the trace instead of tmux, /proc is replaced with a directory rebuilt from the trace and the
+clock is set to the time the event was recorded, so dates render and cached segments age the way
+they did while recording. Late segments are waited for after every event, outside the measured time.
+"""
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import contextlib
+
+
+@contextlib.contextmanager
+def __recorded_clock():
+    """
+    Replaces `time.time` and `datetime.datetime.now` with a clock set by the yielded function.
+    """
+    import datetime
+
+    now = time.time()
+    real_time, real_datetime = time.time, datetime.datetime
+
+    class RecordedDatetime(real_datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return real_datetime.fromtimestamp(now, tz)
+
+    def set_clock(timestamp: float):
+        nonlocal now
+        now = timestamp
+
+    time.time = lambda: now
+    datetime.datetime = RecordedDatetime
+    try:
+        yield set_clock
+    finally:
+        time.time, datetime.datetime = real_time, real_datetime
+
+
+def __apply_proc(root: str, event: dict):
+    """
+    Updates the replayed /proc with the processes listed and the files read by an event.
+    """
+    listing = event.get("list")
+    if listing is not None:
+        pids = set(map(str, listing))
+        for entry in os.listdir(root):
+            if entry not in pids:
+                shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+        for pid in pids:
+            os.makedirs(os.path.join(root, pid), exist_ok=True)
+    for file, content in event.get("proc", {}).items():
+        path = os.path.join(root, file)
+        if content is None:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content.encode("latin-1"))
+
+
+def __replay_once(events: list[dict], directory: str, times: dict[str, list[float]]) -> list[str]:
+    """
+    Replays the events with an empty /proc and segment cache, returns their outputs.
+    """
+    from . import process_name, process_segments, trace
+    from .render import render
+
+    process_segments.reload_plan()
+    shutil.rmtree(directory, ignore_errors=True)
+    os.environ["XDG_RUNTIME_DIR"] = os.path.join(directory, "runtime")
+    process_name.PROC = os.path.join(directory, "proc")
+    os.makedirs(process_name.PROC)
+
+    context: dict[str, str] = {}
+    outputs = []
+    with __recorded_clock() as set_clock:
+        for event in events:
+            context.update(event.get("context", {}))
+            trace.replay_context(context)
+            __apply_proc(process_name.PROC, event)
+            set_clock(event["time"])
+            start = time.perf_counter()
+            try:
+                output = render(event["args"])
+            except Exception as e:
+                output = f"error: {e}"
+            times.setdefault(event["args"][0], []).append(time.perf_counter() - start)
+            outputs.append(output)
+            process_segments.wait_running(10)
+    trace.replay_context(None)
+    return outputs
+
+
+def replay(trace_path: str, config_path: str | None, runs: int, output_path: str | None) -> bool:
+    """
+    Replays a trace runs times, prints the render times of each kind of request, how many outputs
+    differ from the recording and a digest of the outputs. Returns False if the trace or the config
+    can't be loaded.
+    """
+    from . import trace
+    from .bench import load_styler, percentiles
+    from .utils import user_config_path
+
+    config_path = config_path or user_config_path()
+    if config_path is None:
+        print("No config found, pass the path of a config")
+        return False
+    try:
+        events = trace.load(trace_path)
+    except (OSError, ValueError) as e:
+        print(f"Can't load the trace: {e}")
+        return False
+
+    directory = tempfile.mkdtemp()
+    environ = dict(os.environ)
+    try:
+        os.environ["XDG_CACHE_HOME"] = os.path.join(directory, "cache")
+        os.environ.pop(trace.ENV, None)
+        load_styler(config_path)._Styler__write_plan()
+
+        times: dict[str, list[float]] = {}
+        outputs = __replay_once(events, os.path.join(directory, "run"), times)
+        for _ in range(runs - 1):
+            __replay_once(events, os.path.join(directory, "run"), times)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{'request':<10}{'renders':>8}{'total':>12}{'p50':>11}{'p95':>11}{'p99':>11}")
+    for kind, kind_times in sorted(times.items()):
+        p50, p95, p99 = percentiles(kind_times)
+        print(f"{kind:<10}{len(kind_times) // runs:>8}{sum(kind_times) / runs * 1000:>9.1f} ms"
+              f"{p50 * 1000:>8.2f} ms{p95 * 1000:>8.2f} ms{p99 * 1000:>8.2f} ms")
+
+    differ = sum(output != event["output"] for output, event in zip(outputs, events))
+    digest = hashlib.sha256("\0".join(outputs).encode("utf-8")).hexdigest()[:16]
+    print(f"\n{len(events)} events, {differ} outputs differ from the recording, outputs digest {digest}")
+
+    if output_path is not None:
+        import json
+        with open(output_path, "w", encoding="utf-8") as f:
+            for output, event in zip(outputs, events):
+                f.write(json.dumps({"args": event["args"], "output": output}) + "\n")
+    return True
@@ -0,0 +1,137 @@
+"""
+Render server, one per tmux server socket.
+
+Keeps the Statusbar, segment modules and caches loaded between redraws so that
+`#(tmux-styler ...)` jobs only have to forward their arguments over a Unix socket
+instead of starting up and loading everything on every redraw.
+"""
+import os
+import sys
+import json
+import fcntl
+import socketserver
+
+from .client import FORWARD_ENV
+from .render import render
+from .utils import user_segments_path
+
+IDLE_TIMEOUT = 600
+"""
+Seconds without a request before the server shuts itself down.
+"""
+
+
+def _unload_user_segments():
+    """
+    Removes user defined segment modules from the import cache so changes to them are picked up.
+    """
+    path = user_segments_path()
+    if path is None:
+        return
+    for name, module in list(sys.modules.items()):
+        file = getattr(module, "__file__", None)
+        if file is not None and os.path.realpath(file).startswith(path + os.sep):
+            del sys.modules[name]
+
+
+def _connect_control_mode():
+    """
+    Routes context variable lookups over a tmux control mode connection subscribed to the variables
+    used by the statusbar, if enabled in the render plan. The control client is attached to a session
+    like any other client, so without subscriptions none is attached and lookups run `tmux display`.
+    """
+    from ..ContextVars import ContextVar, close_control_mode, use_control_mode
+    from .plan import load_plan
+
+    subscribe = []
+    try:
+        plan = load_plan()
+        if plan.settings().get("subscribe_context"):
+            names = {name for segment in plan.segments().values()
+                     for name in segment["context"]}
+            subscribe = [ContextVar(name) for name in sorted(names)]
+    except (OSError, ValueError):
+        pass
+    if subscribe:
+        use_control_mode(subscribe)
+    else:
+        close_control_mode()
+
+
+class RenderServer(socketserver.UnixStreamServer):
+    """
+    Serves render requests one at a time until it has been idle for `IDLE_TIMEOUT` seconds.
+    """
+
+    timeout = IDLE_TIMEOUT
+
+    def __init__(self, path: str):
+        self.idle = False
+        super().__init__(path, RenderHandler)
+
+    def handle_timeout(self):
+        self.idle = True
+
+    def reload_if_changed(self):
+        """
+        Reloads the render plan and user segments if the config was re-applied since the last request.
+        """
+        # Nothing is loaded until the first statusbar render
+        if "tmux_styler._CLI.process_segments" not in sys.modules:
+            return
+        from . import process_segments
+        if process_segments.plan.is_current():
+            return
+        _unload_user_segments()
+        process_segments.reload_plan()
+        _connect_control_mode()
+
+
+class RenderHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a single request, a JSON line of `{"args": [...], "env": {...}}`.
+    Responds with `{"ok": bool, "output": str}`.
+    """
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        # Requests are handled one at a time so the environment can be swapped per request
+        for var in FORWARD_ENV:
+            os.environ.pop(var, None)
+        os.environ.update(request.get("env", {}))
+        try:
+            self.server.reload_if_changed()
+            # Every request is a job tmux spawned
+            response = {"ok": True, "output": render(request["args"], job=True)}
+        except Exception as e:
+            response = {"ok": False, "output": str(e)}
+        self.wfile.write(json.dumps(response).encode("utf-8"))
+
+
+def serve(path: str):
+    """
+    Runs the render server on the given socket path until it goes idle.
+    Exits immediately if another server already owns the socket.
+    """
+    lock = open(path + ".lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return
+
+    # Any socket left behind is stale since we hold the lock
+    if os.path.exists(path):
+        os.unlink(path)
+
+    _connect_control_mode()
+    with RenderServer(path) as server:
+        try:
+            while not server.idle:
+                server.handle_request()
+        finally:
+            os.unlink(path)
+            lock.close()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
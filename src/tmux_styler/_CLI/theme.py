@@ -0,0 +1,102 @@
+"""
+Compiled theme, the tmux commands of the last `Styler.style()` call saved as a tmux config file.
+
+`main.tmux` sources it on tmux startup so the theme is there right away, and runs the install check
+and the config in the background. The theme is keyed by a hash of the config file, the user's
+segments and the package version, so the config only has to run again when one of them changed.
+"""
+import os
+import sys
+
+from .utils import cache_dir, user_config_path, user_segments_path
+
+HEADER = "# tmux-styler theme "
+
+
+def theme_path() -> str:
+    """
+    Returns the path of the compiled theme.
+    """
+    return os.path.join(cache_dir(), "theme.conf")
+
+
+def theme_key(config_path: str | None) -> str:
+    """
+    Returns the hash of the config file, the user segments and the package version.
+    """
+    import hashlib
+    from importlib import metadata
+
+    digest = hashlib.sha256()
+    try:
+        digest.update(metadata.version("tmux_styler").encode("utf-8"))
+    except metadata.PackageNotFoundError:
+        digest.update(b"unknown")
+
+    files = []
+    if config_path is not None:
+        files.append(os.path.realpath(config_path))
+    segments = user_segments_path()
+    if segments is not None:
+        for root, dirs, names in os.walk(segments):
+            dirs[:] = sorted(dir for dir in dirs if dir != "__pycache__")
+            files.extend(os.path.join(root, name)
+                         for name in sorted(names) if name.endswith(".py"))
+
+    for file in files:
+        digest.update(b"\0" + file.encode("utf-8") + b"\0")
+        try:
+            with open(file, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+    return digest.hexdigest()
+
+
+def running_config_path() -> str | None:
+    """
+    Returns the path of the config the running script is, the script calling `Styler.style()`.
+    """
+    script = sys.argv[0] if sys.argv else ""
+    return os.path.abspath(script) if script.endswith(".py") else None
+
+
+def startup_config_path() -> str | None:
+    """
+    Returns the path of the config `main.tmux` runs, the user's config or the default config.
+    """
+    path = user_config_path()
+    if path is None and os.environ.get("TMUX_STYLER_DIR"):
+        path = os.path.join(os.environ["TMUX_STYLER_DIR"], "default.py")
+    return path
+
+
+def write_theme(commands: list[list[str]]):
+    """
+    Saves the tmux commands as the compiled theme of the running config.
+    """
+    import re
+    from ..ControlMode import quote
+
+    path = theme_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(HEADER + theme_key(running_config_path()) + "\n")
+        for command in commands:
+            args = [arg if re.fullmatch(r"[\w@.-]+", arg) else quote(arg)
+                    for arg in command[1:]]
+            f.write(" ".join([command[0], *args]) + "\n")
+    os.replace(tmp_path, path)
+
+
+def is_current() -> bool:
+    """
+    Whether the compiled theme was compiled from the current config, segments and package version.
+    """
+    try:
+        with open(theme_path(), "r", encoding="utf-8") as f:
+            header = f.readline().rstrip("\n")
+    except FileNotFoundError:
+        return False
+    return header == HEADER + theme_key(startup_config_path())
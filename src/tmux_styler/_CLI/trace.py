@@ -0,0 +1,192 @@
+"""
+Recording of the input renders see, so the render path can be replayed on identical input with
+`tmux-styler replay`, see replay.py.
+
+Recording is enabled by setting `TMUX_STYLER_TRACE=1` in tmux's global environment. Every render
+then appends an event to `trace.log` in the runtime directory: when it was rendered, the render
+request, the values of the context variables it resolved, the /proc files it read and its output.
+Events are written with a single write, so every `tmux-styler` process and the render server can
+append to the log without locking. `tmux-styler trace --save PATH` compacts the log into a trace
+file, gzipped JSON where an event only holds the context values and /proc files that changed since
+the previous event.
+
+Processes looked up with psutil, where /proc isn't available, and tmux calls made by segments
+themselves aren't recorded.
+"""
+import os
+import time
+
+from .utils import runtime_dir
+
+ENV = "TMUX_STYLER_TRACE"
+VERSION = 1
+
+__event: dict | None = None
+"""
+Event of the render being recorded by this process.
+"""
+
+__context: dict[str, str] | None = None
+"""
+Values of the context variables while a trace is replayed, answered instead of asking tmux.
+"""
+
+
+def log_path() -> str:
+    """
+    Returns the path of the trace log.
+    """
+    return os.path.join(runtime_dir(), "trace.log")
+
+
+def enabled() -> bool:
+    """
+    Whether renders are recorded.
+    """
+    return os.environ.get(ENV, "0") == "1"
+
+
+def begin(args: list[str]):
+    """
+    Starts recording the event of a render request.
+    """
+    global __event
+    __event = {"time": time.time(), "args": args, "context": {}, "proc": {}, "list": None}
+
+
+def end(output: str):
+    """
+    Appends the event of the render being recorded to the log.
+    """
+    global __event
+    event, __event = __event, None
+    if event is None:
+        return
+    import json
+    event["output"] = output
+    data = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+    fd = os.open(log_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def record_context(values: dict[str, str]):
+    """
+    Records the values of the context variables resolved by the render.
+    """
+    if __event is not None:
+        __event["context"].update(values)
+
+
+def record_proc(pid: int, name: str, content: bytes | None):
+    """
+    Records a /proc file read by the render, None if it doesn't exist.
+    """
+    if __event is not None:
+        # latin-1 maps every byte to a character, so any content survives JSON
+        __event["proc"][f"{pid}/{name}"] = None if content is None else content.decode("latin-1")
+
+
+def record_listing(entries: list[str]):
+    """
+    Records the pids listed in /proc by the render.
+    """
+    if __event is not None:
+        __event["list"] = sorted(int(entry) for entry in entries if entry.isdigit())
+
+
+def replay_context(values: dict[str, str] | None):
+    """
+    Sets the values of the context variables renders are answered with, None to ask tmux again.
+    """
+    global __context
+    __context = values
+
+
+def replayed_context(names: list[str]) -> dict[str, str] | None:
+    """
+    Returns the replayed values of the context variables, or None if no trace is being replayed.
+    """
+    if __context is None:
+        return None
+    return {name: __context.get(name, "") for name in names}
+
+
+def read() -> list[dict]:
+    """
+    Returns the events of the log, a partially written event at the end is skipped.
+    """
+    import json
+    events = []
+    try:
+        with open(log_path(), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def clear():
+    """
+    Removes the log.
+    """
+    try:
+        os.unlink(log_path())
+    except FileNotFoundError:
+        pass
+
+
+def save(path: str) -> int:
+    """
+    Writes the events of the log to a trace file, oldest first, keeping only what changed since
+    the previous event. Returns the number of events.
+    """
+    import gzip
+    import json
+
+    context: dict[str, str] = {}
+    proc: dict[str, str | None] = {}
+    listing = None
+    events = []
+    for event in sorted(read(), key=lambda event: event["time"]):
+        compact = {"time": event["time"], "args": event["args"], "output": event["output"]}
+        changed = {name: value for name, value in event["context"].items()
+                   if name not in context or context[name] != value}
+        if changed:
+            compact["context"] = changed
+            context.update(changed)
+        # The replayer removes the processes that are no longer listed before writing the files
+        if event["list"] is not None and event["list"] != listing:
+            compact["list"] = listing = event["list"]
+            pids = set(map(str, listing))
+            proc = {file: content for file, content in proc.items()
+                    if file.partition("/")[0] in pids}
+        changed = {file: content for file, content in event["proc"].items()
+                   if file not in proc or proc[file] != content}
+        if changed:
+            compact["proc"] = changed
+            proc.update(changed)
+        events.append(compact)
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "events": events}, f, separators=(",", ":"))
+    return len(events)
+
+
+def load(path: str) -> list[dict]:
+    """
+    Returns the events of a trace file.
+    """
+    import gzip
+    import json
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != VERSION:
+        raise ValueError(f"{path} isn't a version {VERSION} trace")
+    return data["events"]
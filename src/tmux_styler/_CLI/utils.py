@@ -2,13 +2,13 @@ import os
 import sys
 
 
-def get_user_data_path() -> str:
+def cache_dir() -> str:
     """
-    Returns the path to the stored user information.
+    Returns the directory for cached files (the render plan).
     """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    path = os.path.join(current_dir, "..", ".user")
-    return os.path.normpath(path)
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'tmux-styler')
 
 
 def dot_conf_path() -> str:
@@ -67,3 +67,27 @@ def user_segments_to_path():
     path = user_segments_path()
     if path:
         sys.path.append(path)
+
+
+def runtime_dir() -> str:
+    """
+    Returns the directory for runtime files (sockets, locks), creating it if needed.
+    """
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        path = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'tmux-styler')
+    else:
+        tmp_dir = os.environ.get('TMPDIR') or '/tmp'
+        path = os.path.join(tmp_dir, f'tmux-styler-{os.getuid()}')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def tmux_server_name() -> str:
+    """
+    Returns a file name safe identifier for the tmux server this process was started from.
+    """
+    # $TMUX is "socket_path,server_pid,session_index"
+    socket_path = os.environ.get('TMUX', '').split(',')[0]
+    if not socket_path:
+        return 'default'
+    return socket_path.strip('/').replace('/', '-')
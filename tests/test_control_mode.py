@@ -0,0 +1,88 @@
+"""
+`ControlClient` against a stand-in control mode client speaking the protocol on stdin/stdout.
+"""
+import sys
+import textwrap
+
+import pytest
+
+from tmux_styler.ControlMode import ControlClient, ControlModeError
+
+FAKE_CONTROL_MODE = textwrap.dedent('''
+    import re
+    import sys
+    import shlex
+
+    VALUES = {
+        "%0": {"session_name": "main", "pane_current_path": "/home/user"},
+        "%1": {"session_name": "main", "pane_current_path": "/tmp"},
+    }
+
+    def expand(format, pane):
+        return re.sub(r"#\\{(\\w+)\\}", lambda match: VALUES[pane].get(match[1], ""), format)
+
+    def reply(number, lines, error=False):
+        end = "%error" if error else "%end"
+        sys.stdout.write("".join(line + "\\n" for line in
+                                 [f"%begin 1 {number} 1", *lines, f"{end} 1 {number} 1"]))
+        sys.stdout.flush()
+
+    # The attach command
+    reply(0, [])
+    for number, line in enumerate(sys.stdin, 1):
+        argv = shlex.split(line)
+        if argv[:2] == ["display-message", "-p"]:
+            pane = argv[3] if argv[2] == "-t" else "%0"
+            reply(number, [expand(argv[-1], pane)])
+            # Notifications arrive in between responses
+            print("%window-add @1", flush=True)
+        elif argv[:2] == ["refresh-client", "-B"]:
+            name, _, format = argv[2].split(":", 2)
+            reply(number, [])
+            for pane in VALUES:
+                print(f"%subscription-changed {name} $0 @0 0 {pane} - : {expand(format, pane)}",
+                      flush=True)
+        else:
+            reply(number, [f"unknown command: {argv[0]}"], error=True)
+''')
+
+
+@pytest.fixture
+def client(tmp_path):
+    script = tmp_path / "control_mode.py"
+    script.write_text(FAKE_CONTROL_MODE)
+    client = ControlClient([sys.executable, str(script)])
+    yield client
+    client.close()
+
+
+def test_display_pipelined(client: ControlClient):
+    formats = ["#{session_name}", "#{pane_current_path}", "", "'quoted' #{session_name}", "#{unknown}"]
+    assert client.display(formats) == ["main", "/home/user", "", "'quoted' main", ""]
+    assert client.display(["#{pane_current_path}"], "%1") == ["/tmp"]
+
+
+def test_command_error(client: ControlClient):
+    with pytest.raises(ControlModeError, match="unknown command"):
+        client.command("bogus")
+    # Responses after the error are still matched to their commands
+    assert client.display(["#{session_name}"]) == ["main"]
+    assert client.alive
+
+
+def test_subscriptions(client: ControlClient):
+    name = client.subscribe("#{pane_current_path}")
+    assert client.subscribe("#{pane_current_path}") == name
+    assert client.subscribe("#{session_name}") != name
+    # Notifications are handled in order, they are in by the time the next response is
+    client.display(["#{session_name}"])
+    assert client.subscribed("#{pane_current_path}", "%0") == "/home/user"
+    assert client.subscribed("#{pane_current_path}", "%1") == "/tmp"
+    assert client.subscribed("#{session_name}", "%1") == "main"
+    assert client.subscribed("#{pane_current_path}", "%2") is None
+
+
+def test_connection_lost(client: ControlClient):
+    client.close()
+    with pytest.raises(ControlModeError):
+        client.display(["#{session_name}"])
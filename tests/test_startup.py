@@ -0,0 +1,22 @@
+"""
+Startup time of the CLI modes tmux runs on every redraw, against their budgets.
+"""
+import pytest
+
+from startup import STARTUP_BUDGETS_MS, startup_costs
+
+RUNS = 5
+"""
+Runs of each mode, the median is checked.
+"""
+
+
+@pytest.fixture(scope="module")
+def costs() -> dict[str, float]:
+    return startup_costs(RUNS)[1]
+
+
+@pytest.mark.parametrize("mode", STARTUP_BUDGETS_MS)
+def test_within_budget(costs: dict[str, float], mode: str):
+    assert costs[mode] <= STARTUP_BUDGETS_MS[mode], \
+        f"{mode} takes {costs[mode]:.1f} ms, over its {STARTUP_BUDGETS_MS[mode]} ms budget"